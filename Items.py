@@ -3,95 +3,179 @@ import shutil
 import json
 from datetime import datetime
 
+import metrics
+from catalog_store import CatalogStore, VersionConflict, migrate_from_json
+from catalog_export import bulk_export, export_archive, select_entries
+from catalog_import import import_entries, new_product_code, validate_entry
+
 # Create catalog directory
 catalog_dir = "catalog"
 os.makedirs(catalog_dir, exist_ok=True)
 
+_store = None
+
+def get_store():
+    """Return the catalog store, migrating a legacy catalog.json on first use.
+
+    Raises RuntimeError if the legacy catalog cannot be migrated, rather than
+    opening (and creating) an empty catalog.db that would hide it.
+    """
+    global _store
+    if _store is None:
+        catalog_file = os.path.join(catalog_dir, "catalog.json")
+        catalog_db = os.path.join(catalog_dir, "catalog.db")
+        if not os.path.exists(catalog_db) and os.path.exists(catalog_file):
+            try:
+                count, rejected = migrate_from_json(catalog_file, catalog_db)
+                print(f"Migrated {count} entries from {catalog_file} to {catalog_db}")
+                if rejected:
+                    print(f"Skipped {rejected} invalid entries; see {os.path.splitext(catalog_file)[0]}.rejects.jsonl")
+            except Exception as e:
+                print(f"Error migrating catalog: {e}")
+                raise RuntimeError(f"Could not migrate {catalog_file}; fix it and try again.") from e
+        _store = CatalogStore(catalog_db)
+    return _store
+
+@metrics.timed("catalog.load")
 def load_catalog():
-    """Load catalog from file."""
-    catalog_file = os.path.join(catalog_dir, "catalog.json")
-    if not os.path.exists(catalog_file):
-        return []
+    """Load all catalog entries."""
     try:
-        with open(catalog_file, "r") as file:
-            return json.load(file)
+        return list(get_store())
     except Exception as e:
         print(f"Error loading catalog: {e}")
         return []
 
+@metrics.timed("catalog.save")
 def save_catalog(data):
-    """Save catalog to file."""
-    catalog_file = os.path.join(catalog_dir, "catalog.json")
+    """Save catalog entries, replacing any with the same product code."""
     try:
-        with open(catalog_file, "w") as file:
-            json.dump(data, file, indent=4)
+        get_store().put_many(data)
     except Exception as e:
         print(f"Error saving catalog: {e}")
 
-def search_catalog(query, field=None):
-    """Search for entries in the catalog."""
-    catalog = load_catalog()
-    if field:
-        results = [entry for entry in catalog if field in entry and query.lower() in str(entry[field]).lower()]
-    else:
-        results = [entry for entry in catalog if any(query.lower() in str(value).lower() for value in entry.values())]
-    return results
+def add_ring():
+    """Add a single ring entry interactively."""
+    entry = {
+        "ring_name": input("Enter ring name: ").strip(),
+        "image": input("Enter image path: ").strip(),
+        "product_code": input("Enter product code (leave blank to generate one): ").strip(),
+    }
+    while True:
+        field = input("Enter an extra field name (leave blank to finish): ").strip()
+        if not field:
+            break
+        entry[field] = input(f"Enter value for {field}: ").strip()
+    try:
+        entry = validate_entry(entry, check_images=True)
+    except ValueError as e:
+        print(f"Invalid entry: {e}")
+        return
+    if "product_code" not in entry:
+        entry["product_code"] = new_product_code()
+    elif entry["product_code"] in get_store():
+        print(f"Product code {entry['product_code']} already exists.")
+        return
+    get_store().put(entry)
+    print(f"Added {entry['ring_name']} as {entry['product_code']}.")
+
+@metrics.timed("catalog.import")
+def import_catalog(path, report_path=None):
+    """Bulk-import rings from a CSV or JSON Lines file."""
+    if not os.path.exists(path):
+        print(f"File not found: {path}")
+        return
+    imported, rejected = import_entries(get_store(), path, report_path)
+    print(f"Imported {imported} entries, rejected {rejected}.")
+    if rejected:
+        print(f"See {report_path or os.path.splitext(path)[0] + '.rejects.jsonl'} for rejected rows.")
+
+@metrics.timed("catalog.search")
+def search_catalog(query, field=None, match="all", limit=20, offset=0):
+    """Search for entries in the catalog, best matches first."""
+    return get_store().search(query, field=field, match=match, limit=limit, offset=offset)
 
 def edit_entry(product_code):
     """Edit an entry in the catalog."""
-    catalog = load_catalog()
-    for entry in catalog:
-        if entry["product_code"] == product_code:
-            if entry.get("locked", False):
-                print("This entry is locked and cannot be edited.")
-                return
-            print(f"Editing entry: {entry}")
-            for key in entry.keys():
-                if key in ["product_code", "image", "locked"]:
-                    continue  # Do not allow changes to these fields
-                new_value = input(f"Enter new value for {key} (leave blank to keep '{entry[key]}'): ").strip()
-                if new_value:
-                    entry[key] = new_value
-            save_catalog(catalog)
-            print("Entry updated.")
+    with metrics.timer("catalog.get"):
+        entry, version = get_store().get_versioned(product_code)
+    if entry is None:
+        print("Entry not found.")
+        return
+    if entry.get("locked", False):
+        print("This entry is locked and cannot be edited.")
+        return
+    print(f"Editing entry: {entry}")
+    changes = {}
+    for key in entry.keys():
+        if key in ["product_code", "image", "locked"]:
+            continue  # Do not allow changes to these fields
+        new_value = input(f"Enter new value for {key} (leave blank to keep '{entry[key]}'): ").strip()
+        if new_value:
+            changes[key] = new_value
+    if changes:
+        # Only apply the edit if nobody (including lock_entry) changed the entry meanwhile.
+        try:
+            with metrics.timer("catalog.update"):
+                get_store().update(product_code, changes, expected_version=version)
+        except VersionConflict:
+            metrics.count("catalog.version_conflicts")
+            print("The entry was changed (or locked) by someone else while you were editing. Please try again.")
             return
-    print("Entry not found.")
+    print("Entry updated.")
 
+@metrics.timed("catalog.lock")
 def lock_entry(product_code):
     """Lock an entry to prevent editing."""
-    catalog = load_catalog()
-    for entry in catalog:
-        if entry["product_code"] == product_code:
-            entry["locked"] = True
-            save_catalog(catalog)
-            print(f"Entry {product_code} locked.")
-            return
-    print("Entry not found.")
+    if get_store().update(product_code, {"locked": True}) is None:
+        print("Entry not found.")
+        return
+    print(f"Entry {product_code} locked.")
 
+@metrics.timed("catalog.export")
 def export_entry(product_code):
     """Export an entry and its image to a directory."""
-    catalog = load_catalog()
-    for entry in catalog:
-        if entry["product_code"] == product_code:
-            if not entry.get("locked", False):
-                print("This entry must be locked before export.")
-                return
-            export_dir = os.path.join(catalog_dir, entry["ring_name"].replace(" ", "_"))
-            os.makedirs(export_dir, exist_ok=True)
-            
-            # Export JSON
-            export_file = os.path.join(export_dir, f"{entry['ring_name']}.json")
-            with open(export_file, "w") as file:
-                json.dump(entry, file, indent=4)
-            
-            # Copy image
-            shutil.copy(entry["image"], export_dir)
-            print(f"Entry exported to {export_dir}")
-            return
-    print("Entry not found.")
+    entry = get_store().get(product_code)
+    if entry is None:
+        print("Entry not found.")
+        return
+    if not entry.get("locked", False):
+        print("This entry must be locked before export.")
+        return
+    export_dir = os.path.join(catalog_dir, entry["ring_name"].replace(" ", "_"))
+    os.makedirs(export_dir, exist_ok=True)
+
+    # Export JSON
+    export_file = os.path.join(export_dir, f"{entry['ring_name']}.json")
+    with open(export_file, "w") as file:
+        json.dump(entry, file, indent=4)
+
+    # Copy image
+    shutil.copy(entry["image"], export_dir)
+    print(f"Entry exported to {export_dir}")
+
+@metrics.timed("catalog.bulk_export")
+def bulk_export_entries(field=None, value=None, archive_path=None, workers=8):
+    """Export all locked entries, or those whose field contains value.
+
+    Writes per-ring directories (skipping unchanged entries), or a single
+    .zip/.tar archive when archive_path is given.
+    """
+    entries = select_entries(get_store(), field, value)
+    if archive_path:
+        counts = export_archive(get_store(), archive_path, entries)
+        print(f"Exported {counts['exported']} entries to {archive_path} ({counts['failed']} failed).")
+    else:
+        counts = bulk_export(get_store(), catalog_dir, entries, workers=workers)
+        print(f"Exported {counts['exported']} entries, {counts['unchanged']} unchanged, {counts['failed']} failed.")
+    return counts
 
 def main_menu():
     """Main menu for catalog operations."""
+    try:
+        get_store()
+    except RuntimeError as e:
+        print(e)
+        return
     while True:
         print("\nCatalog Menu:")
         print("1. Add a new ring")
@@ -99,21 +183,29 @@ def main_menu():
         print("3. Edit an entry")
         print("4. Lock an entry")
         print("5. Export an entry")
-        print("6. Exit")
+        print("6. Bulk export locked entries")
+        print("7. Import rings from CSV/JSONL")
+        print("8. Exit")
         choice = input("Choose an option: ").strip()
         
         if choice == "1":
-            main()
+            add_ring()
         elif choice == "2":
             query = input("Enter search query: ").strip()
             field = input("Enter field to search (or leave blank for all fields): ").strip()
-            results = search_catalog(query, field if field else None)
-            if results:
+            match = "any" if input("Match any term instead of all? (y/n): ").strip().lower() == "y" else "all"
+            offset = 0
+            while True:
+                results = search_catalog(query, field if field else None, match=match, offset=offset)
+                if not results:
+                    print("No results found." if offset == 0 else "No more results.")
+                    break
                 print("Search results:")
                 for result in results:
                     print(result)
-            else:
-                print("No results found.")
+                if len(results) < 20 or input("Show more? (y/n): ").strip().lower() != "y":
+                    break
+                offset += len(results)
         elif choice == "3":
             product_code = input("Enter product code to edit: ").strip()
             edit_entry(product_code)
@@ -124,10 +216,17 @@ def main_menu():
             product_code = input("Enter product code to export: ").strip()
             export_entry(product_code)
         elif choice == "6":
+            field = input("Only export entries where field (leave blank for all): ").strip()
+            value = input("...contains: ").strip() if field else None
+            archive_path = input("Archive file (.zip/.tar.gz, leave blank for folders): ").strip()
+            bulk_export_entries(field or None, value, archive_path or None)
+        elif choice == "7":
+            import_catalog(input("Enter path of the CSV or JSONL file: ").strip())
+        elif choice == "8":
             print("Goodbye!")
             break
         else:
             print("Invalid choice. Please try again.")
 
 if __name__ == "__main__":
-    main_menu()
+    metrics.profiled(main_menu)
@@ -1,40 +1,120 @@
- from pipin import install_requirements
-   
+from pipen import ensure_requirements
+
 
 import os
 import json
 import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import datetime, timedelta
+
+import metrics
+from content_pools import ContentPool, PictureDirectory, item_id
+from deals import DealBook, describe, load_feed, normalize_deal
+from autogen import ComboGenerator, PostHistory
+from pool_browser import browse_pool
+from images import PictureIndex
+from templates import TemplateRegistry, post_context
+from browser_pool import FACEBOOK_URL, SessionPool
+from jsonl_store import JsonlStore
+from post_history import open_history
+from post_scheduler import PostJobStore, PostScheduler
+from waits import StepTimer, document_ready, element_clickable, element_present, network_idle
 
 class TwinkleTonesCLI:
-    def __init__(self):
-        self.base_dir = 'TwinkleTones'
+    def __init__(self, base_dir='TwinkleTones'):
+        self.base_dir = base_dir
+        self.home_url = os.environ.get('TT_FACEBOOK_URL', FACEBOOK_URL)
+        self.session_pool = None
+        self._templates = None
+        self._scheduler = None
+        self._history = None
         self.load_data()
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
-
+        self.post_scheduler = PostScheduler(
+            PostJobStore(os.path.join(self.base_dir, 'scheduled_posts.db')),
+            self.run_scheduled_post,
+            max_workers=int(os.environ.get('TT_BROWSER_SESSIONS', '1')),
+            ready=self.can_post_unattended,
+        )
+
+    @property
+    def scheduler(self):
+        """The APScheduler background scheduler, imported and started on first use."""
+        if self._scheduler is None:
+            from apscheduler.schedulers.background import BackgroundScheduler
+
+            self._scheduler = BackgroundScheduler()
+            self._scheduler.start()
+        return self._scheduler
+
+    def start_dispatcher(self):
+        """Start polling for due scheduled posts, once."""
+        if self._scheduler is None:
+            self.post_scheduler.start(self.scheduler)
+
+    def shutdown_scheduler(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+    CONTENT_FILES = {
+        'quotes/quotes.json': None,
+        'text/text.json': None,
+        'symbols/symbols.json': None,
+        'deals/deals.json': 'deals',
+    }
+
+    @metrics.timed('app.load_data')
     def load_data(self):
-        self.quotes = self.load_json('quotes/quotes.json')
-        self.texts = self.load_json('text/text.json')
-        self.symbols = self.load_json('symbols/symbols.json')
-        self.deals = self.load_json('deals/deals.json')
-        self.pictures = self.load_pictures()
-
-    def load_json(self, filename):
-        try:
-            with open(os.path.join(self.base_dir, filename)) as json_file:
-                return json.load(json_file)
-        except FileNotFoundError:
+        """Set up lazily loaded content pools; nothing is read until first use."""
+        self.pools = {
+            filename: ContentPool(self.content_store(filename, key))
+            for filename, key in self.CONTENT_FILES.items()
+        }
+        self.deal_book = DealBook(self.pools['deals/deals.json'])
+        self.picture_dir = PictureDirectory(os.path.join(self.base_dir, 'pictures'))
+        self.picture_index = PictureIndex(os.path.join(self.base_dir, 'pictures'))
+
+    @property
+    def quotes(self):
+        return self.load_json('quotes/quotes.json')
+
+    @property
+    def texts(self):
+        return self.load_json('text/text.json')
+
+    @property
+    def symbols(self):
+        return self.load_json('symbols/symbols.json')
+
+    @property
+    def deals(self):
+        """Deals that have not expired; expired ones are dropped from the pool on access."""
+        if self.pools['deals/deals.json'].exists():
+            self.deal_book.purge_expired()
+        return self.load_json('deals/deals.json', key='deals')
+
+    @property
+    def pictures(self):
+        return self.load_pictures()
+
+    def content_store(self, filename, key=None):
+        """Return the JSON Lines store backing a content file such as 'quotes/quotes.json'."""
+        legacy_path = os.path.join(self.base_dir, filename)
+        jsonl_path = os.path.splitext(legacy_path)[0] + '.jsonl'
+        return JsonlStore(jsonl_path, legacy_path=legacy_path, legacy_key=key)
+
+    def load_json(self, filename, key=None):
+        pool = self.pools.get(filename) or ContentPool(self.content_store(filename, key))
+        if not pool.exists():
             print(f"File not found: {filename}. Please ensure it exists.")
             return []
+        try:
+            return pool.items
+        except (OSError, json.JSONDecodeError, AttributeError):
+            print(f"Error reading {filename}. Please check the file and format.")
+            return []
 
     def load_pictures(self):
-        pictures_dir = os.path.join(self.base_dir, 'pictures')
-        return [f for f in os.listdir(pictures_dir) if f.endswith(('.png', '.jpg', '.jpeg'))]
+        return self.picture_dir.items
 
     def display_instructions(self):
         instructions = """
@@ -42,7 +122,8 @@ class TwinkleTonesCLI:
         
         Instructions:
         1. You will be presented with options for quotes, texts, symbols, and images.
-        2. Select the corresponding number for your desired option.
+        2. Page through each list ('n'/'p', 'g <page>'), filter it with '/ <words>',
+           and enter the ID shown in brackets to select an option.
         3. Optionally, select a product deal to promote.
         4. After selection, review and modify your post.
         5. Finally, log in to your Facebook account to schedule or post directly.
@@ -50,41 +131,68 @@ class TwinkleTonesCLI:
         """
         print(instructions)
 
-    def display_options(self):
-        print("\nQuotes:")
-        for idx, quote in enumerate(self.quotes):
-            print(f"{idx + 1}: {quote}")
+    def pool_for(self, kind):
+        """Return the cached pool for 'quote', 'text', 'symbol', 'deal' or 'picture'."""
+        if kind == 'picture':
+            return self.picture_dir
+        filename = {'quote': 'quotes/quotes.json', 'text': 'text/text.json',
+                    'symbol': 'symbols/symbols.json', 'deal': 'deals/deals.json'}[kind]
+        return self.pools[filename]
 
-        print("\nTexts:")
-        for idx, text in enumerate(self.texts):
-            print(f"{idx + 1}: {text}")
+    def describe_deal(self, deal):
+        return describe(deal)
 
-        print("\nSymbols:")
-        for idx, symbol in enumerate(self.symbols):
-            print(f"{idx + 1}: {symbol}")
-
-        print("\nDeals:")
-        for idx, deal in enumerate(self.deals['deals']):
-            print(f"{idx + 1}: {deal['product']} - {deal['price']} ({deal['discount']})")
-
-        print("\nPictures:")
-        for idx, picture in enumerate(self.pictures):
-            print(f"{idx + 1}: {picture}")
+    def display_options(self):
+        print("\nAvailable content:")
+        print(f"Quotes: {len(self.quotes)}")
+        print(f"Texts: {len(self.texts)}")
+        print(f"Symbols: {len(self.symbols)}")
+        print(f"Deals: {len(self.deals)}")
+        for deal in self.deal_book.top_by_discount(3) if self.deals else []:
+            print(f"  Top deal: {self.describe_deal(deal)}")
+        print(f"Pictures: {len(self.pictures)}")
 
     def select_content(self):
-        quote_index = int(input("Select a quote (number): ")) - 1
-        text_index = int(input("Select a text (number): ")) - 1
-        symbol_index = int(input("Select a symbol (number): ")) - 1
-        deal_index = int(input("Select a deal (number) (or skip by entering 0): ")) - 1 if input("Use a deal? (y/n): ").lower() == 'y' else None
-        picture_index = int(input("Select a picture (number): ")) - 1
+        selected_quote = browse_pool(self.pool_for('quote'), "Quote")
+        selected_text = browse_pool(self.pool_for('text'), "Text")
+        selected_symbol = browse_pool(self.pool_for('symbol'), "Symbol")
+        selected_deal = None
+        if self.deals and input("Use a deal? (y/n): ").lower() == 'y':
+            selected_deal = browse_pool(self.pool_for('deal'), "Deal", describe=self.describe_deal, allow_skip=True)
+        selected_picture = browse_pool(self.pool_for('picture'), "Picture")
+
+        selection = self.selection_ids(selected_quote, selected_text, selected_symbol, selected_picture, selected_deal)
+        return self.compose_content(selected_quote, selected_text, selected_symbol), selected_deal, selected_picture, selection
+
+    def selection_ids(self, quote, text, symbol, picture, deal=None):
+        """Stable IDs of the items making up a post, saved with it for dedup and cooldowns."""
+        return {
+            'quote': item_id(quote),
+            'text': item_id(text),
+            'symbol': item_id(symbol),
+            'picture': item_id(picture),
+            'deal': item_id(deal) if deal else None,
+        }
 
-        selected_quote = self.quotes[quote_index]
-        selected_text = self.texts[text_index]
-        selected_symbol = self.symbols[symbol_index]
-        selected_picture = self.pictures[picture_index]
-        selected_deal = self.deals['deals'][deal_index] if deal_index is not None else None
+    def resolve_item(self, kind, ref):
+        """Look up a quote/text/symbol/deal/picture by ID, 1-based number or value.
 
-        return f"{selected_quote} {selected_text} {selected_symbol}", selected_deal, selected_picture
+        Deals can also be referenced by product name; expired deals are
+        purged first, as for self.deals. Raises LookupError if nothing matches.
+        """
+        pool = self.pool_for(kind)
+        items = self.deals if kind == 'deal' else pool.items
+        if isinstance(ref, int):
+            if 1 <= ref <= len(items):
+                return items[ref - 1]
+        else:
+            item = pool.get(ref)
+            if item is not None:
+                return item
+            for item in items:
+                if item == ref or (kind == 'deal' and item.get('product') == ref):
+                    return item
+        raise LookupError(f"No {kind} matches {ref!r}")
 
     def add_new_content(self):
         print("\nSelect the type of content to add:")
@@ -93,6 +201,7 @@ class TwinkleTonesCLI:
         print("3. Symbol")
         print("4. Deal")
         print("5. Picture")
+        print("6. Deal feed (CSV/JSON Lines/JSON file)")
         content_type = input("Enter the number of your selection: ")
 
         if content_type == '1':
@@ -109,29 +218,46 @@ class TwinkleTonesCLI:
             price = input("Enter the price: ")
             discount = input("Enter the discount: ")
             link = input("Enter the product link: ")
-            new_deal = {"product": product, "price": price, "discount": discount, "link": link}
+            expires = input("Enter the expiry (YYYY-MM-DD HH:MM, blank for none): ")
+            try:
+                new_deal = normalize_deal({"product": product, "price": price, "discount": discount,
+                                           "link": link, "expires": expires})
+            except ValueError as e:
+                print(f"Invalid deal: {e}")
+                return
             self.add_to_json('deals/deals.json', new_deal, key="deals")
         elif content_type == '5':
             picture_path = input("Enter the path of the picture: ")
             self.add_picture(picture_path)
+        elif content_type == '6':
+            feed_path = input("Enter the path of the deal feed: ")
+            self.load_deal_feed(feed_path)
         else:
             print("Invalid selection!")
 
+    @metrics.timed('app.add_to_json')
     def add_to_json(self, file_path, data, key=None):
         try:
-            full_path = os.path.join(self.base_dir, file_path)
-            with open(full_path, 'r+') as file:
-                json_data = json.load(file)
-                if key:
-                    json_data[key].append(data)
-                else:
-                    json_data.append(data)
-                file.seek(0)
-                json.dump(json_data, file, indent=4)
+            pool = self.pools.get(file_path) or ContentPool(self.content_store(file_path, key))
+            pool.append(data)
             print(f"Added new data to {file_path}")
-        except (FileNotFoundError, json.JSONDecodeError):
+        except (OSError, json.JSONDecodeError, AttributeError):
             print(f"Error adding data to {file_path}. Please check the file and format.")
 
+    @metrics.timed('app.load_deal_feed')
+    def load_deal_feed(self, feed_path):
+        if not os.path.exists(feed_path):
+            print(f"File not found: {feed_path}")
+            return
+        try:
+            added, updated, rejected = load_feed(self.pools['deals/deals.json'], feed_path)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading {feed_path}: {e}")
+            return
+        print(f"Added {added} deals, updated {updated}, rejected {rejected}.")
+        if rejected:
+            print(f"See {os.path.splitext(feed_path)[0]}.rejects.jsonl for rejected rows.")
+
     def add_picture(self, picture_path):
         if not os.path.exists(picture_path):
             print(f"File not found: {picture_path}")
@@ -140,104 +266,277 @@ class TwinkleTonesCLI:
             print(f"Invalid file format: {picture_path}. Please upload a .png, .jpg, or .jpeg file.")
             return
         try:
-            picture_name = os.path.basename(picture_path)
-            destination = os.path.join(self.base_dir, 'pictures', picture_name)
-            os.rename(picture_path, destination)
-            print(f"Picture successfully added to {destination}")
+            [(_, status, picture_name)] = self.picture_index.ingest([picture_path], workers=1, move=True)
         except Exception as e:
             print(f"Error adding picture: {e}")
+            return
+        if status == 'added':
+            self.picture_dir.added(picture_name)
+            print(f"Picture successfully added to {os.path.join(self.base_dir, 'pictures', picture_name)}")
+        elif status == 'duplicate':
+            print(f"This picture is already in the collection as {picture_name}.")
+        else:
+            print(f"Error adding picture: {status}")
 
-    def login_facebook(self, email, password):
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')  # Run in headless mode
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+    def get_session_pool(self, interactive=True):
+        """Return the warm browser session pool.
 
-        driver.get("https://www.facebook.com/")
-        time.sleep(2)  # Wait for page to load
+        Credentials come from TT_FB_EMAIL/TT_FB_PASSWORD, or are asked for
+        the first time when interactive. Returns None if neither is possible.
+        """
+        if self.session_pool is None:
+            email = os.environ.get('TT_FB_EMAIL')
+            password = os.environ.get('TT_FB_PASSWORD')
+            if not (email and password):
+                if not interactive:
+                    return None
+                email = input("Enter your Facebook email: ")
+                password = input("Enter your Facebook password: ")
+            self.session_pool = SessionPool(
+                email,
+                password,
+                size=int(os.environ.get('TT_BROWSER_SESSIONS', '1')),
+                home_url=self.home_url,
+                profiles_dir=os.path.join(self.base_dir, 'browser_profiles'),
+            )
+        return self.session_pool
+
+    def close_sessions(self):
+        if self.session_pool is not None:
+            self.session_pool.close()
+            self.session_pool = None
+
+    @property
+    def templates(self):
+        """Post templates: the built-ins plus any in TwinkleTones/templates.json, loaded on first use."""
+        if self._templates is None:
+            self._templates = TemplateRegistry()
+            self._templates.load_file(os.path.join(self.base_dir, 'templates.json'))
+        return self._templates
+
+    def compose_content(self, quote, text, symbol):
+        return self.templates.render('selection', {'quote': quote, 'text': text, 'symbol': symbol})
+
+    @metrics.timed('app.generate_post_content')
+    def generate_post_content(self, content, deal, template='post', platform='facebook'):
+        return self.templates.render(template, post_context(content, deal), platform)
+
+    def new_step_timer(self, **context):
+        return StepTimer(os.path.join(self.base_dir, 'metrics', 'post_timings.jsonl'), **context)
+
+    @metrics.timed('app.post_to_facebook')
+    def post_to_facebook(self, driver, content, scheduled_time, picture, timer=None):
+        from selenium.webdriver.common.by import By
+
+        timer = timer or StepTimer()
+        with timer.step("navigate"):
+            driver.get(self.home_url)  # Navigate to Facebook homepage
+            document_ready(driver)
 
-        driver.find_element(By.ID, "email").send_keys(email)
-        driver.find_element(By.ID, "pass").send_keys(password)
-        driver.find_element(By.NAME, "login").click()
-        time.sleep(5)  # Wait for login to complete
+        # Locate the post input field
+        with timer.step("compose"):
+            element_clickable(driver, (By.CSS_SELECTOR, "[name='xhpc_message']")).send_keys(content)
 
-        return driver
+        # Handle image upload
+        with timer.step("upload"):
+            image_input = element_present(driver, (By.CSS_SELECTOR, "[data-testid='media-attachment-add-photo']"))
+            image_input.send_keys(os.path.abspath(self.picture_index.upload_path(picture)))
 
-    def generate_post_content(self, content, deal):
-        if deal:
-            product_info = f"\n📢 Deal Alert! 📢\n\nGet our {deal['product']} now for just {deal['price']}! 🔥 That's {deal['discount']} off the original price.\n\n👉 Buy Now: {deal['link']}\n"
-            return content + product_info + f"\n#Discount #BuyNow #{deal['product'].replace(' ', '')}"
-        return content
+        # Simulate posting
+        with timer.step("submit"):
+            element_clickable(driver, (By.CSS_SELECTOR, "[data-testid='react-composer-post-button']")).click()
+            network_idle(driver)
 
-    def post_to_facebook(self, driver, content, scheduled_time, picture):
-        driver.get("https://www.facebook.com/")  # Navigate to Facebook homepage
-        time.sleep(2)
+        print(f"Posted (scheduled for: {scheduled_time}).")
 
-        # Locate the post input field
-        driver.find_element(By.CSS_SELECTOR, "[name='xhpc_message']").send_keys(content)
+    @property
+    def history(self):
+        """The post history store, importing saved_posts.jsonl on first use."""
+        if self._history is None:
+            self._history = open_history(self.base_dir)
+        return self._history
 
-        # Handle image upload
-        image_input = driver.find_element(By.CSS_SELECTOR, "[data-testid='media-attachment-add-photo']")
-        image_input.send_keys(os.path.join(self.base_dir, 'pictures', picture))
+    def load_saved_posts(self):
+        """Stream saved posts, oldest first, without loading the whole history."""
+        return iter(self.history)
 
-        # Simulate posting
-        driver.find_element(By.CSS_SELECTOR, "[data-testid='react-composer-post-button']").click()
+    def deliver(self, pool, post_content, picture, post_time, **context):
+        """Post through a pooled browser session and record step timings, without saving the post.
+
+        Returns the recorded timings.
+        """
+        timer = self.new_step_timer(picture=picture, **context)
+        try:
+            with pool.session(timer=timer) as session:
+                self.post_to_facebook(session.driver, post_content, post_time, picture, timer)
+        finally:
+            record = timer.flush()
+        return record
 
-        print(f"Post scheduled for: {scheduled_time}.")
+    @metrics.timed('app.publish')
+    def publish(self, pool, post_content, deal, picture, post_time, selection=None, **context):
+        """Post through a pooled browser session, record step timings and save the post.
 
-    def save_post(self, content, deal, picture, scheduled_time):
-        saved_posts_file = os.path.join(self.base_dir, 'saved_posts.json')
-        post = {
-            'content': content,
+        Returns the recorded timings.
+        """
+        record = self.deliver(pool, post_content, picture, post_time, **context)
+        self.save_post(post_content, deal, picture, post_time, selection)
+        return record
+
+    def schedule_post(self, post_content, deal, picture, due, selection=None, dispatch=True):
+        """Queue a post for due (a datetime) in the persistent job store.
+
+        With dispatch=False the job is only stored; it goes out once a
+        process with the dispatcher running (app.py) reaches its due time.
+        """
+        payload = {
+            'content': post_content,
             'deal': deal,
             'picture': picture,
-            'scheduled_time': scheduled_time
+            'scheduled_time': due.strftime("%Y-%m-%d %H:%M:%S"),
+            'selection': selection,
         }
+        job_id = self.post_scheduler.schedule(payload, due.timestamp())
+        if dispatch:
+            self.start_dispatcher()
+        metrics.count('posts.scheduled')
+        print(f"Post {job_id} scheduled for: {payload['scheduled_time']}.")
+        return job_id
+
+    def can_post_unattended(self):
+        """Whether scheduled posts can go out without asking for anything: a session pool or credentials exist."""
+        return self.session_pool is not None or bool(os.environ.get('TT_FB_EMAIL') and os.environ.get('TT_FB_PASSWORD'))
+
+    def run_scheduled_post(self, payload):
+        pool = self.get_session_pool(interactive=False)
+        if pool is None:
+            raise RuntimeError("No Facebook credentials available for scheduled posts.")
+        self.deliver(pool, payload['content'], payload['picture'], payload['scheduled_time'])
+        # The post is out: a failure to save it must not make the scheduler retry (and repost) it.
+        try:
+            self.save_post(payload['content'], payload['deal'], payload['picture'], payload['scheduled_time'],
+                           payload.get('selection'))
+        except Exception as e:
+            print(f"Error saving scheduled post to the history: {e}")
+
+    @metrics.timed('app.save_post')
+    def save_post(self, content, deal, picture, scheduled_time, selection=None):
+        self.history.add(content, deal, picture, scheduled_time, selection)
+        print(f"Post saved for reuse: {content}")
+
+    def auto_generate(self, count, cooldown=0, deal_probability=0.5, weights=None, seed=None):
+        """Generate up to count posts from random, never-posted combinations.
+
+        Only the last `cooldown` posts are read from the history (for the
+        per-item cooldowns); every other duplicate check is an indexed
+        lookup in the history store. weights maps a kind ('quote', 'picture', ...)
+        to {item ID: weight}. Returns (post_content, deal, picture, selection)
+        tuples.
+        """
+        history = PostHistory.from_posts(self.history.recent(cooldown), lookup=self.history.has_post)
+        # Posts already waiting in the scheduler count as used too.
+        for payload in self.post_scheduler.store.pending_payloads():
+            history.add(payload['content'], payload['picture'], payload['deal'], payload.get('selection'))
+
+        def render(chosen):
+            content = self.compose_content(chosen['quote'], chosen['text'], chosen['symbol'])
+            return self.generate_post_content(content, chosen['deal'])
 
+        pools = {'quote': self.quotes, 'text': self.texts, 'symbol': self.symbols,
+                 'picture': self.pictures, 'deal': self.deals}
+        generator = ComboGenerator(pools, history, render, weights, cooldown, deal_probability, seed=seed)
+        return generator.generate(count)
+
+    def run_auto_mode(self):
         try:
-            with open(saved_posts_file, 'r+') as file:
-                posts = json.load(file)
-                posts.append(post)
-                file.seek(0)
-                json.dump(posts, file, indent=4)
-        except FileNotFoundError:
-            with open(saved_posts_file, 'w') as file:
-                json.dump([post], file, indent=4)
-        print(f"Post saved for reuse: {post['content']}")
+            count = int(input("How many posts should be generated? "))
+            interval = float(input("Hours between posts (0 to post them all now): ") or 0)
+            cooldown = int(input("Posts before an item may be reused (default 0): ") or 0)
+        except ValueError:
+            print("Please enter numbers only.")
+            return
+        posts = self.auto_generate(count, cooldown=cooldown)
+        if len(posts) < count:
+            print(f"Only {len(posts)} unused combination(s) were available.")
+        if not posts:
+            return
+        for number, (post_content, deal, picture, _) in enumerate(posts, start=1):
+            print(f"\n--- Post {number} (picture: {picture}) ---\n{post_content}")
+        if input("\nSchedule these posts? (y/n): ").lower() != 'y':
+            return
+        pool = self.get_session_pool()
+        start = datetime.now()
+        for number, (post_content, deal, picture, selection) in enumerate(posts):
+            if interval > 0:
+                self.schedule_post(post_content, deal, picture, start + timedelta(hours=interval * (number + 1)), selection)
+            else:
+                self.publish(pool, post_content, deal, picture, time.strftime("%Y-%m-%d %H:%M:%S"), selection)
+
+    def ask_schedule_time(self):
+        """Ask when to post. Returns a datetime, or None to post now."""
+        while True:
+            answer = input("Schedule for (YYYY-MM-DD HH:MM, blank to post now): ").strip()
+            if not answer:
+                return None
+            try:
+                return datetime.strptime(answer, "%Y-%m-%d %H:%M")
+            except ValueError:
+                print("Invalid time format. Please use YYYY-MM-DD HH:MM.")
 
     def run(self):
         self.display_instructions()
+        # Only load APScheduler up front if there are posts from an earlier run to send.
+        waiting = self.post_scheduler.store.count('pending') + self.post_scheduler.store.count('running')
+        if waiting:
+            self.start_dispatcher()
+            if not self.can_post_unattended():
+                print(f"{waiting} scheduled post(s) are waiting for Facebook credentials. They will be sent once you "
+                      "log in to post (option 1), or set TT_FB_EMAIL and TT_FB_PASSWORD.")
 
         while True:
             print("\n1. Create and post")
             print("2. Add new content")
-            print("3. Exit")
+            print("3. Auto-generate posts")
+            print("4. Exit")
 
             option = input("Select an option: ")
 
             if option == '1':
                 self.display_options()
-                content, deal, picture = self.select_content()
-                email = input("Enter your Facebook email: ")
-                password = input("Enter your Facebook password: ")
-
-                driver = self.login_facebook(email, password)
-
-                # Post content to Facebook
-                post_time = time.strftime("%Y-%m-%d %H:%M:%S")
+                content, deal, picture, selection = self.select_content()
                 post_content = self.generate_post_content(content, deal)
-                self.post_to_facebook(driver, post_content, post_time, picture)
-                self.save_post(post_content, deal, picture, post_time)
+                due = self.ask_schedule_time()
+                # Log in now so scheduled posts can reuse the session later.
+                pool = self.get_session_pool()
+
+                if due is not None and due > datetime.now():
+                    self.schedule_post(post_content, deal, picture, due, selection)
+                else:
+                    # Post content to Facebook
+                    post_time = time.strftime("%Y-%m-%d %H:%M:%S")
+                    self.publish(pool, post_content, deal, picture, post_time, selection)
 
             elif option == '2':
                 self.add_new_content()
 
             elif option == '3':
+                self.run_auto_mode()
+
+            elif option == '4':
                 print("Exiting...")
+                pending = self.post_scheduler.store.count('pending')
+                if pending:
+                    print(f"{pending} scheduled post(s) will be sent the next time the tool runs.")
+                self.shutdown_scheduler()
+                self.post_scheduler.shutdown()
+                self.close_sessions()
+                if self._history is not None:
+                    self._history.close()
                 break
             else:
                 print("Invalid option. Please select again.")
 
 if __name__ == "__main__":
-     install_requirements()
+    ensure_requirements()
     app = TwinkleTonesCLI()
-    app.run()
+    metrics.profiled(app.run)
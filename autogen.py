@@ -0,0 +1,140 @@
+import random
+import hashlib
+from bisect import bisect
+from itertools import accumulate
+
+from content_pools import LEGACY_ID_LENGTH, item_id
+
+KINDS = ('quote', 'text', 'symbol', 'picture', 'deal')
+
+
+def post_key(content, picture):
+    """64-bit key identifying a posted combination by its rendered text and picture."""
+    data = f"{content}\0{picture}".encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+class PostHistory:
+    """Compact view of past posts for deduplication and cooldowns.
+
+    Keeps only a set of 64-bit post keys and, per content kind, the position
+    of the last post that used each item, so it is built in one pass over
+    the posts given and answers every check in O(1). lookup(content,
+    picture), if given, is asked about posts not in that set, so the full
+    history can stay in a store (only the last `cooldown` posts need to be
+    passed in).
+    """
+
+    def __init__(self, lookup=None):
+        self.keys = set()
+        self.last_used = {kind: {} for kind in KINDS}
+        self.count = 0
+        self.lookup = lookup
+
+    @classmethod
+    def from_posts(cls, posts, lookup=None):
+        history = cls(lookup)
+        for post in posts:
+            history.add(post.get('content', ''), post.get('picture'), post.get('deal'), post.get('selection'))
+        return history
+
+    def add(self, content, picture, deal=None, selection=None):
+        self.keys.add(post_key(content, picture))
+        used = dict(selection or {})
+        if picture is not None:
+            used.setdefault('picture', item_id(picture))
+        if deal:
+            used.setdefault('deal', item_id(deal))
+        for kind, key in used.items():
+            if key is not None and kind in self.last_used:
+                self.last_used[kind][key] = self.count
+        self.count += 1
+
+    def seen(self, content, picture):
+        """Whether this content was already posted with this picture."""
+        if post_key(content, picture) in self.keys:
+            return True
+        return self.lookup is not None and self.lookup(content, picture)
+
+    def cooling_down(self, kind, key, cooldown):
+        used = self.last_used[kind]
+        last = used.get(key)
+        if last is None:
+            last = used.get(key[:LEGACY_ID_LENGTH])  # recorded before IDs were widened
+        return last is not None and self.count - last <= cooldown
+
+
+class _WeightedPool:
+    def __init__(self, items, weights=None):
+        self.items = items
+        self.ids = [item_id(item) for item in items]
+        weights = weights or {}
+        self.cumulative = list(accumulate(max(weights.get(key, 1.0), 0.0) for key in self.ids))
+
+    def pick(self, rng):
+        total = self.cumulative[-1] if self.cumulative else 0
+        if total <= 0:
+            return None
+        index = bisect(self.cumulative, rng.random() * total)
+        return self.items[min(index, len(self.items) - 1)], self.ids[min(index, len(self.items) - 1)]
+
+
+class ComboGenerator:
+    """Samples quote x text x symbol x picture (x optional deal) combinations.
+
+    Each candidate is drawn by weighted sampling per kind (weights map item
+    IDs to relative weights, default 1). It is rejected if one of its items
+    was used within the last `cooldown` posts, or if the rendered post was
+    already published. Every check is a set or dict lookup, so a batch costs
+    O(batch size), not O(history).
+    """
+
+    def __init__(self, pools, history, render, weights=None, cooldown=0, deal_probability=0.5,
+                 max_attempts_per_post=200, seed=None):
+        weights = weights or {}
+        self.pools = {kind: _WeightedPool(pools.get(kind, []), weights.get(kind)) for kind in KINDS}
+        self.history = history
+        self.render = render
+        self.cooldown = cooldown
+        self.deal_probability = deal_probability
+        self.max_attempts_per_post = max_attempts_per_post
+        self.rng = random.Random(seed)
+
+    def _candidate(self):
+        selection = {}
+        chosen = {}
+        for kind in KINDS:
+            if kind == 'deal' and (not self.pools['deal'].items or self.rng.random() >= self.deal_probability):
+                chosen['deal'] = selection['deal'] = None
+                continue
+            picked = self.pools[kind].pick(self.rng)
+            if picked is None:
+                return None
+            item, key = picked
+            if self.cooldown and self.history.cooling_down(kind, key, self.cooldown):
+                return None
+            chosen[kind] = item
+            selection[kind] = key
+        return chosen, selection
+
+    def generate(self, count):
+        """Return up to count new posts as (post_content, deal, picture, selection) tuples.
+
+        Fewer are returned if the pools run out of unused combinations.
+        """
+        posts = []
+        for _ in range(count):
+            for _ in range(self.max_attempts_per_post):
+                candidate = self._candidate()
+                if candidate is None:
+                    continue
+                chosen, selection = candidate
+                content = self.render(chosen)
+                if self.history.seen(content, chosen['picture']):
+                    continue
+                self.history.add(content, chosen['picture'], chosen['deal'], selection)
+                posts.append((content, chosen['deal'], chosen['picture'], selection))
+                break
+            else:
+                break  # nothing unused left within the attempt budget
+        return posts
@@ -0,0 +1,172 @@
+"""Non-interactive batch posting.
+
+Reads post specs from a JSON Lines queue file, one per line:
+
+    {"id": "spring-1", "quote": 3, "text": 1, "symbol": 2, "deal": "Gold Ring",
+     "picture": "ring.jpg", "at": "2024-10-10 15:30:00"}
+
+quote/text/symbol/deal/picture are IDs, 1-based numbers or exact values (deals may
+also be named by product). "deal" and "at" are optional; jobs without "at"
+run as soon as a worker is free. Jobs due more than --max-wait seconds
+from now are handed to the persistent scheduler queue instead of holding
+a worker, and are posted by app.py once due. Each job's outcome is
+appended to the results file.
+
+Usage:
+    TT_FB_EMAIL=... TT_FB_PASSWORD=... python batch.py queue.jsonl --workers 4
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import metrics
+from app import TwinkleTonesCLI
+from browser_pool import SessionPool
+from jsonl_store import JsonlStore
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        return datetime.fromisoformat(value)
+
+
+def build_post(app, spec):
+    """Resolve a spec into (post_content, deal, picture, selection)."""
+    quote = app.resolve_item('quote', spec['quote'])
+    text = app.resolve_item('text', spec['text'])
+    symbol = app.resolve_item('symbol', spec['symbol'])
+    picture = app.resolve_item('picture', spec['picture'])
+    deal = app.resolve_item('deal', spec['deal']) if spec.get('deal') is not None else None
+    post_content = app.generate_post_content(app.compose_content(quote, text, symbol), deal)
+    return post_content, deal, picture, app.selection_ids(quote, text, symbol, picture, deal)
+
+
+def run_job(app, pool, spec, retries=3, backoff=2.0, max_wait=60):
+    """Post (or schedule) one spec, with retries. Returns a result record."""
+    job_id = spec.get('id')
+    result = {'id': job_id, 'status': 'failed', 'attempts': 0, 'error': None, 'timings': None}
+    try:
+        post_content, deal, picture, selection = build_post(app, spec)
+        due = parse_time(spec.get('at'))
+    except (KeyError, LookupError, ValueError, TypeError) as e:
+        result.update(status='invalid', error=str(e), finished_at=datetime.now().strftime(TIME_FORMAT))
+        return result
+
+    if due is not None:
+        delay = (due - datetime.now()).total_seconds()
+        if delay > max_wait:
+            result['job'] = app.schedule_post(post_content, deal, picture, due, selection, dispatch=False)
+            result.update(status='scheduled', finished_at=datetime.now().strftime(TIME_FORMAT))
+            return result
+        if delay > 0:
+            time.sleep(delay)
+
+    # Only delivery is retried: once the post is out, retrying would post it again.
+    for attempt in range(1, retries + 2):
+        result['attempts'] = attempt
+        try:
+            post_time = datetime.now().strftime(TIME_FORMAT)
+            result['timings'] = app.deliver(pool, post_content, picture, post_time, job_id=job_id)
+            result.update(status='posted', error=None)
+            break
+        except Exception as e:
+            result['error'] = f"{e.__class__.__name__}: {e}"
+            if attempt <= retries:
+                metrics.count('batch.retries')
+                # Exponential backoff with jitter so workers do not retry in lockstep.
+                time.sleep(backoff ** attempt * (0.5 + random.random()))
+    if result['status'] == 'posted':
+        try:
+            app.save_post(post_content, deal, picture, post_time, selection)
+        except Exception as e:
+            result['error'] = f"posted but not saved to the history: {e.__class__.__name__}: {e}"
+    result['finished_at'] = datetime.now().strftime(TIME_FORMAT)
+    return result
+
+
+def run_batch(app, pool, queue_path, results_path, workers=1, retries=3, backoff=2.0, max_wait=60):
+    """Run every spec in queue_path on a pool of workers. Returns (posted, failed, scheduled)."""
+    results = JsonlStore(results_path)
+    counts = {'posted': 0, 'failed': 0, 'scheduled': 0}
+    lock = threading.Lock()
+    # Bound the number of queued jobs so huge queue files stream through.
+    slots = threading.BoundedSemaphore(workers * 2)
+
+    def work(spec):
+        try:
+            try:
+                result = run_job(app, pool, spec, retries, backoff, max_wait)
+            except Exception as e:
+                result = {'id': spec.get('id') if isinstance(spec, dict) else None, 'status': 'failed',
+                          'attempts': 0, 'error': f"{e.__class__.__name__}: {e}", 'timings': None,
+                          'finished_at': datetime.now().strftime(TIME_FORMAT)}
+            try:
+                results.append(result)
+            except OSError as e:
+                print(f"Could not record the result of job {result['id']}: {e}")
+                result['status'] = 'failed'
+            with lock:
+                counts[result['status'] if result['status'] in counts else 'failed'] += 1
+            print(f"[{result['status']}] job {result['id']} after {result['attempts']} attempt(s)")
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for spec in JsonlStore(queue_path):
+            slots.acquire()
+            executor.submit(work, spec)
+    return counts['posted'], counts['failed'], counts['scheduled']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Post a queue of Twinkle Tones posts without prompts.")
+    parser.add_argument('queue', help="JSON Lines file of post specs")
+    parser.add_argument('--results', default='batch_results.jsonl', help="where to append per-job results")
+    parser.add_argument('--workers', type=int, default=1, help="number of parallel browser sessions")
+    parser.add_argument('--retries', type=int, default=3, help="retries per job after the first attempt")
+    parser.add_argument('--backoff', type=float, default=2.0, help="base of the exponential retry backoff in seconds")
+    parser.add_argument('--max-wait', type=float, default=60,
+                        help="jobs due later than this many seconds from now go to the scheduler queue")
+    args = parser.parse_args(argv)
+
+    email = os.environ.get('TT_FB_EMAIL')
+    password = os.environ.get('TT_FB_PASSWORD')
+    if not email or not password:
+        print("Set TT_FB_EMAIL and TT_FB_PASSWORD to run in batch mode.")
+        return 1
+
+    app = TwinkleTonesCLI()
+    pool = SessionPool(
+        email,
+        password,
+        size=args.workers,
+        home_url=app.home_url,
+        profiles_dir=os.path.join(app.base_dir, 'browser_profiles'),
+    )
+    try:
+        posted, failed, scheduled = run_batch(app, pool, args.queue, args.results, args.workers, args.retries,
+                                              args.backoff, args.max_wait)
+    finally:
+        pool.close()
+        app.shutdown_scheduler()
+        app.post_scheduler.shutdown()
+    print(f"Batch finished: {posted} posted, {failed} failed, {scheduled} scheduled. Results in {args.results}")
+    if scheduled:
+        print("Scheduled jobs are posted by app.py once they are due.")
+    return 0 if failed == 0 else 2
+
+
+if __name__ == "__main__":
+    sys.exit(metrics.profiled(main))
@@ -0,0 +1,256 @@
+"""Benchmarks for the catalog, content storage and post-generation hot paths.
+
+Generates a synthetic catalog and content pools at each requested size
+(seeded, so every run sees the same data), then times
+  - Items.load_catalog, search_catalog, edit_entry and lock_entry,
+  - TwinkleTonesCLI.add_to_json, save_post and generate_post_content,
+and reports throughput, p50/p99 latency and peak traced memory per
+operation as JSON. Pass an earlier report with --compare to print the
+change in p50/p99 latency against it.
+
+Usage:
+    python bench.py [--sizes 1000 10000 100000] [--output bench_results.json]
+                    [--compare old.json] [--dir bench_data] [--keep]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tracemalloc
+import contextlib
+from datetime import datetime
+
+import metrics
+from catalog_store import CatalogStore
+from jsonl_store import atomic_write_lines
+
+SIZES = (1000, 10000, 100000)
+SEED = 1234
+WORDS = (
+    "gold silver platinum rose white diamond ruby sapphire emerald pearl opal garnet "
+    "solitaire halo vintage classic modern twisted braided eternity promise engagement "
+    "wedding band cluster marquise oval round princess cushion pear heart infinity"
+).split()
+SYMBOLS = ("✨", "💍", "💎", "🌟", "❤️", "🔥", "🌙", "⭐")
+
+# Iterations per operation. Whole-catalog loads are capped so large sizes stay quick.
+ITERATIONS = {
+    "load_catalog": 5,
+    "search_catalog": 300,
+    "edit_entry": 300,
+    "lock_entry": 300,
+    "add_to_json": 300,
+    "save_post": 300,
+    "generate_post_content": 2000,
+}
+
+
+def _phrase(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def generate_catalog(count, seed=SEED):
+    """Yield count synthetic ring entries."""
+    rng = random.Random(seed)
+    for number in range(count):
+        yield {
+            "product_code": f"BENCH-{number:07d}",
+            "ring_name": _phrase(rng, 2, 4).title(),
+            "image": f"images/ring_{number}.jpg",
+            "material": rng.choice(WORDS),
+            "description": _phrase(rng, 8, 16),
+            "price": f"${rng.randint(50, 5000)}",
+            "locked": False,
+        }
+
+
+def generate_content(count, seed=SEED):
+    """Return {content file: records} for the quote, text, symbol and deal pools."""
+    rng = random.Random(seed)
+    return {
+        'quotes/quotes.json': [_phrase(rng, 6, 14).capitalize() + "." for _ in range(count)],
+        'text/text.json': [_phrase(rng, 4, 10).capitalize() + "!" for _ in range(count)],
+        'symbols/symbols.json': ["".join(rng.choices(SYMBOLS, k=3)) + f" {n}" for n in range(count)],
+        'deals/deals.json': [
+            {"product": _phrase(rng, 2, 3).title(), "price": f"${rng.randint(50, 900)}",
+             "discount": f"{rng.randint(5, 60)}%", "link": f"https://example.com/p/{n}"}
+            for n in range(count)
+        ],
+    }
+
+
+def write_jsonl(path, records):
+    atomic_write_lines(path, (json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+
+
+def build_catalog(path, count, batch_size=5000):
+    store = CatalogStore(path)
+    entries = generate_catalog(count)
+    while True:
+        batch = [entry for _, entry in zip(range(batch_size), entries)]
+        if not batch:
+            break
+        store.insert_many(batch)
+    return store
+
+
+def build_app(base_dir, count):
+    """A TwinkleTonesCLI on base_dir with count items per content pool and count saved posts."""
+    from app import TwinkleTonesCLI
+
+    for filename, records in generate_content(count).items():
+        write_jsonl(os.path.splitext(os.path.join(base_dir, filename))[0] + '.jsonl', records)
+    os.makedirs(os.path.join(base_dir, 'pictures'), exist_ok=True)
+    rng = random.Random(SEED)
+    write_jsonl(os.path.join(base_dir, 'saved_posts.jsonl'), (
+        {"content": _phrase(rng, 10, 20), "deal": None, "picture": f"ring_{n % 50}.jpg",
+         "scheduled_time": "2024-01-01 12:00:00", "selection": None}
+        for n in range(count)
+    ))
+    # Constructing the app does not start the scheduler; that only happens on first use.
+    return TwinkleTonesCLI(base_dir)
+
+
+def measure(operation, iterations):
+    """Time operation(i) for i in range(iterations), then trace one more call for peak memory."""
+    timings = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        operation(0)  # warm caches and lazy connections
+        for i in range(iterations):
+            start = time.perf_counter()
+            operation(i + 1)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            operation(iterations + 1)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    timings.sort()
+    total = sum(timings)
+    return {
+        "iterations": iterations,
+        "throughput_per_s": round(iterations / total, 2) if total else None,
+        "p50_ms": round(metrics.percentile(timings, 0.50) * 1000, 4),
+        "p99_ms": round(metrics.percentile(timings, 0.99) * 1000, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def _answers(value):
+    """An input() replacement that answers every prompt with value."""
+    return lambda prompt="": value
+
+
+def bench_size(directory, count, operations=None):
+    import Items
+
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    store = build_catalog(os.path.join(directory, "catalog.db"), count)
+    app = build_app(os.path.join(directory, "TwinkleTones"), count)
+    setup_s = time.perf_counter() - started
+
+    rng = random.Random(SEED)
+    queries = [" ".join(rng.sample(WORDS, rng.randint(1, 2))) for _ in range(64)]
+    # Disjoint codes for edits and locks, so no edit hits an entry the lock benchmark locked.
+    codes = [f"BENCH-{n:07d}" for n in rng.sample(range(count), min(count, 1024))]
+    edit_codes, lock_codes = codes[::2], codes[1::2]
+    deals = app.deals[:64]
+    quotes, texts, symbols = app.quotes, app.texts, app.symbols
+
+    def edit(i):
+        Items.input = _answers(f"edited {i}")
+        try:
+            Items.edit_entry(edit_codes[i % len(edit_codes)])
+        finally:
+            del Items.input
+
+    def generate(i):
+        content = app.compose_content(quotes[i % len(quotes)], texts[i % len(texts)], symbols[i % len(symbols)])
+        return app.generate_post_content(content, deals[i % len(deals)] if i % 2 else None)
+
+    benchmarks = {
+        "load_catalog": lambda i: Items.load_catalog(),
+        "search_catalog": lambda i: Items.search_catalog(queries[i % len(queries)]),
+        "edit_entry": edit,
+        "lock_entry": lambda i: Items.lock_entry(lock_codes[i % len(lock_codes)]),
+        "add_to_json": lambda i: app.add_to_json('quotes/quotes.json', f"Benchmark quote {i}"),
+        "save_post": lambda i: app.save_post(f"Benchmark post {i}", None, "ring_1.jpg", "2024-01-01 12:00:00"),
+        "generate_post_content": generate,
+    }
+    previous_store, Items._store = Items._store, store
+    try:
+        results = {}
+        for name, operation in benchmarks.items():
+            if operations and name not in operations:
+                continue
+            results[name] = measure(operation, ITERATIONS[name])
+            print(f"  {name:<22} p50 {results[name]['p50_ms']:>10.3f} ms  "
+                  f"p99 {results[name]['p99_ms']:>10.3f} ms  {results[name]['throughput_per_s']:>12} ops/s")
+    finally:
+        Items._store = previous_store
+        store.close()
+    return {"setup_s": round(setup_s, 2), "operations": results}
+
+
+def compare(report, baseline):
+    """Print the relative p50/p99 change of every operation found in both reports."""
+    for size, result in report["results"].items():
+        old_ops = baseline.get("results", {}).get(size, {}).get("operations", {})
+        for name, new in result["operations"].items():
+            old = old_ops.get(name)
+            if not old:
+                continue
+            changes = []
+            for key in ("p50_ms", "p99_ms"):
+                change = (new[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+                changes.append(f"{key[:3]} {change:+.1f}%")
+            print(f"{size:>8} {name:<22} " + "  ".join(changes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark catalog, content and post hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                        help="entries per catalog and content pool (e.g. 1000 10000 100000 1000000)")
+    parser.add_argument("--only", nargs="+", choices=sorted(ITERATIONS), help="run only these operations")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--dir", default="bench_data")
+    parser.add_argument("--keep", action="store_true", help="keep the generated data")
+    args = parser.parse_args(argv)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": SEED,
+        },
+        "results": {},
+    }
+    shutil.rmtree(args.dir, ignore_errors=True)
+    try:
+        for size in args.sizes:
+            print(f"{size} entries:")
+            report["results"][str(size)] = bench_size(os.path.join(args.dir, str(size)), size, args.only)
+    finally:
+        if not args.keep:
+            shutil.rmtree(args.dir, ignore_errors=True)
+
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as file:
+            compare(report, json.load(file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(metrics.profiled(main))
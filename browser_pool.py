@@ -0,0 +1,234 @@
+import os
+import json
+import queue
+import threading
+from contextlib import contextmanager
+
+import metrics
+from waits import StepTimer, document_ready, element_clickable, wait_for
+
+FACEBOOK_URL = "https://www.facebook.com/"
+DRIVER_PATH_CACHE = ".chromedriver_path"
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_chromedriver(cache_file=DRIVER_PATH_CACHE):
+    """Return the chromedriver path, resolving it at most once.
+
+    CHROMEDRIVER in the environment wins. Otherwise the path found by
+    webdriver-manager is remembered for this process and written to
+    cache_file so later runs skip the lookup entirely.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path:
+            return _driver_path
+        path = os.environ.get("CHROMEDRIVER")
+        if not path and os.path.exists(cache_file):
+            with open(cache_file) as file:
+                cached = file.read().strip()
+            if cached and os.path.exists(cached):
+                path = cached
+        if not path:
+            from webdriver_manager.chrome import ChromeDriverManager
+
+            path = ChromeDriverManager().install()
+            with open(cache_file, "w") as file:
+                file.write(path)
+        _driver_path = path
+        return path
+
+
+class BrowserSession:
+    """A Chrome driver bound to a persistent profile directory.
+
+    Reusing the profile keeps Facebook's login cookies between runs; cookies
+    are also saved to cookies.json in the profile so they can be restored if
+    Chrome discards the session. Selenium is imported by the methods that
+    drive the browser, so importing this module stays cheap.
+    """
+
+    def __init__(self, profile_dir, home_url=FACEBOOK_URL, headless=True):
+        self.profile_dir = os.path.abspath(profile_dir)
+        self.home_url = home_url
+        self.headless = headless
+        self.driver = None
+
+    @property
+    def cookies_file(self):
+        return os.path.join(self.profile_dir, "cookies.json")
+
+    def start(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        os.makedirs(self.profile_dir, exist_ok=True)
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless')
+        options.add_argument(f'--user-data-dir={self.profile_dir}')
+        self.driver = webdriver.Chrome(service=Service(resolve_chromedriver()), options=options)
+        return self.driver
+
+    def is_healthy(self):
+        from selenium.common.exceptions import WebDriverException
+
+        if self.driver is None:
+            return False
+        try:
+            self.driver.execute_script("return document.readyState")
+            return True
+        except WebDriverException:
+            return False
+
+    def needs_login(self):
+        from selenium.webdriver.common.by import By
+        return any(field.is_displayed() for field in self.driver.find_elements(By.ID, "email"))
+
+    @metrics.timed('browser.login')
+    def login(self, email, password, timer=None):
+        """Open the home page and log in unless the profile already is."""
+        from selenium.webdriver.common.by import By
+
+        timer = timer or StepTimer()
+        with timer.step("navigate"):
+            self.driver.get(self.home_url)
+            self.load_cookies()
+            document_ready(self.driver)
+        if not self.needs_login():
+            return
+        with timer.step("login"):
+            self.driver.find_element(By.ID, "email").send_keys(email)
+            self.driver.find_element(By.ID, "pass").send_keys(password)
+            start_url = self.driver.current_url
+            element_clickable(self.driver, (By.NAME, "login")).click()
+            # Done once the page navigates away or the login form disappears.
+            wait_for(
+                self.driver,
+                lambda d: d.current_url != start_url or not self.needs_login(),
+                message="login did not complete",
+            )
+        self.save_cookies()
+
+    def save_cookies(self):
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            with open(self.cookies_file, "w") as file:
+                json.dump(self.driver.get_cookies(), file)
+        except (OSError, WebDriverException) as e:
+            print(f"Could not save cookies: {e}")
+
+    def load_cookies(self):
+        from selenium.common.exceptions import WebDriverException
+
+        if not os.path.exists(self.cookies_file):
+            return
+        try:
+            with open(self.cookies_file) as file:
+                cookies = json.load(file)
+        except (OSError, json.JSONDecodeError):
+            return
+        if not cookies:
+            return
+        for cookie in cookies:
+            try:
+                self.driver.add_cookie(cookie)
+            except WebDriverException:
+                continue
+        self.driver.refresh()
+
+    def quit(self):
+        from selenium.common.exceptions import WebDriverException
+
+        if self.driver is not None:
+            try:
+                self.driver.quit()
+            except WebDriverException:
+                pass
+            self.driver = None
+
+
+class SessionPool:
+    """Keeps up to size logged-in browser sessions warm for reuse.
+
+    Sessions are created on demand (or all at once with warm()), checked
+    before every use and replaced if the browser has died. Each slot owns a
+    profile directory under profiles_dir so logins survive restarts.
+    """
+
+    def __init__(self, email, password, size=1, home_url=FACEBOOK_URL, profiles_dir="browser_profiles", headless=True):
+        self.email = email
+        self.password = password
+        self.size = size
+        self.home_url = home_url
+        self.profiles_dir = profiles_dir
+        self.headless = headless
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def _new_session(self, timer=None):
+        with self._lock:
+            if self._created >= self.size:
+                return None
+            slot = self._created
+            self._created += 1
+        session = BrowserSession(os.path.join(self.profiles_dir, f"session-{slot}"), self.home_url, self.headless)
+        try:
+            session.start()
+            session.login(self.email, self.password, timer)
+        except Exception:
+            session.quit()
+            with self._lock:
+                self._created -= 1
+            raise
+        with self._lock:
+            self._sessions.append(session)
+        return session
+
+    def warm(self):
+        """Start and log in every session up front."""
+        while True:
+            session = self._new_session()
+            if session is None:
+                break
+            self._idle.put(session)
+
+    @metrics.timed('browser.acquire')
+    def acquire(self, timeout=None, timer=None):
+        try:
+            session = self._idle.get_nowait()
+        except queue.Empty:
+            session = self._new_session(timer) or self._idle.get(timeout=timeout)
+        if not session.is_healthy():
+            session.quit()
+            try:
+                session.start()
+                session.login(self.email, self.password, timer)
+            except Exception:
+                session.quit()
+                self.release(session)  # keep the slot; the next acquire retries it
+                raise
+        return session
+
+    def release(self, session):
+        self._idle.put(session)
+
+    @contextmanager
+    def session(self, timeout=None, timer=None):
+        session = self.acquire(timeout, timer)
+        try:
+            yield session
+        finally:
+            self.release(session)
+
+    def close(self):
+        for session in self._sessions:
+            session.quit()
+        self._sessions = []
+        self._created = 0
+        self._idle = queue.Queue()
@@ -0,0 +1,189 @@
+import os
+import io
+import json
+import time
+import shutil
+import hashlib
+import tarfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from jsonl_store import atomic_write_lines
+
+MANIFEST_NAME = "export_manifest.json"
+
+
+def entry_hash(entry):
+    data = json.dumps(entry, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def export_name(entry):
+    return entry["ring_name"].replace(" ", "_")
+
+
+def select_entries(store, field=None, value=None, include_unlocked=False):
+    """Stream the entries to export: locked ones, optionally where field contains value."""
+    for entry in store:
+        if not include_unlocked and not entry.get("locked", False):
+            continue
+        if field and str(value).lower() not in str(entry.get(field, "")).lower():
+            continue
+        yield entry
+
+
+def load_manifest(path):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    atomic_write_lines(path, [json.dumps(manifest, indent=4, sort_keys=True)])
+
+
+def _is_current(record, entry_digest, image, export_dir):
+    """True if a manifest record still matches the entry, its image and the files on disk."""
+    if not record or record.get("entry_hash") != entry_digest or record.get("dir") != export_dir:
+        return False
+    if not os.path.exists(os.path.join(export_dir, record["json"])):
+        return False
+    if not os.path.exists(os.path.join(export_dir, os.path.basename(image))):
+        return False
+    if record.get("image_signature") == file_signature(image):
+        return True
+    # Touched but possibly unchanged: compare contents before recopying.
+    return record.get("image_hash") == file_hash(image)
+
+
+def _export_one(entry, catalog_dir, previous):
+    export_dir = os.path.join(catalog_dir, export_name(entry))
+    digest = entry_hash(entry)
+    image = entry["image"]
+    if _is_current(previous, digest, image, export_dir):
+        previous["image_signature"] = file_signature(image)
+        return "unchanged", previous
+
+    os.makedirs(export_dir, exist_ok=True)
+    json_name = f"{entry['ring_name']}.json"
+    atomic_write_lines(os.path.join(export_dir, json_name), [json.dumps(entry, indent=4)])
+    image_digest = file_hash(image)
+    target = os.path.join(export_dir, os.path.basename(image))
+    if not (previous and previous.get("image_hash") == image_digest and os.path.exists(target)):
+        shutil.copy(image, export_dir)
+    return "exported", {
+        "dir": export_dir,
+        "json": json_name,
+        "entry_hash": digest,
+        "image_hash": image_digest,
+        "image_signature": file_signature(image),
+    }
+
+
+def bulk_export(store, catalog_dir, entries=None, workers=8, manifest_path=None):
+    """Export entries (locked ones by default) into per-ring directories in parallel.
+
+    A manifest of entry and image hashes is kept in catalog_dir, so re-runs
+    skip entries whose JSON and image are unchanged and only copy what
+    differs. Returns a dict counting 'exported', 'unchanged' and 'failed'.
+    """
+    manifest_path = manifest_path or os.path.join(catalog_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    entries = select_entries(store) if entries is None else entries
+    counts = {"exported": 0, "unchanged": 0, "failed": 0}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for entry in entries:
+            code = entry["product_code"]
+            futures[executor.submit(_export_one, entry, catalog_dir, manifest.get(code))] = code
+        for future, code in futures.items():
+            try:
+                status, record = future.result()
+            except (OSError, KeyError) as e:
+                print(f"Error exporting {code}: {e}")
+                counts["failed"] += 1
+                continue
+            manifest[code] = record
+            counts[status] += 1
+
+    save_manifest(manifest_path, manifest)
+    return counts
+
+
+class _ArchiveWriter:
+    """Streams files into a .zip or .tar(.gz/.bz2/.xz) archive as they are produced."""
+
+    def __init__(self, path):
+        self.path = path
+        if path.endswith(".zip"):
+            self.archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+            self.kind = "zip"
+        else:
+            compression = next(
+                (mode for suffix, mode in ((".gz", "gz"), (".tgz", "gz"), (".bz2", "bz2"), (".xz", "xz"))
+                 if path.endswith(suffix)),
+                "",
+            )
+            # "w|" opens a stream: members are written sequentially, never seeked back to.
+            self.archive = tarfile.open(path, f"w|{compression}")
+            self.kind = "tar"
+
+    def add_bytes(self, name, data):
+        if self.kind == "zip":
+            self.archive.writestr(name, data)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            self.archive.addfile(info, io.BytesIO(data))
+
+    def add_file(self, name, path):
+        if self.kind == "zip":
+            self.archive.write(path, name)
+        else:
+            self.archive.add(path, name)
+
+    def close(self):
+        self.archive.close()
+
+
+def export_archive(store, archive_path, entries=None):
+    """Write entries (locked ones by default) and their images into one archive.
+
+    Entries are streamed from the store and written one at a time, so the
+    catalog is never held in memory. Returns a dict counting 'exported' and
+    'failed'.
+    """
+    entries = select_entries(store) if entries is None else entries
+    counts = {"exported": 0, "failed": 0}
+    writer = _ArchiveWriter(archive_path)
+    try:
+        for entry in entries:
+            folder = export_name(entry)
+            try:
+                writer.add_file(f"{folder}/{os.path.basename(entry['image'])}", entry["image"])
+            except (OSError, KeyError) as e:
+                print(f"Error exporting {entry.get('product_code')}: {e}")
+                counts["failed"] += 1
+                continue
+            writer.add_bytes(f"{folder}/{entry['ring_name']}.json", json.dumps(entry, indent=4).encode("utf-8"))
+            counts["exported"] += 1
+    finally:
+        writer.close()
+    return counts
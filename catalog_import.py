@@ -0,0 +1,133 @@
+import os
+import csv
+import json
+import uuid
+import sqlite3
+from itertools import islice
+from contextlib import ExitStack
+
+from jsonl_store import JsonlStore
+
+REQUIRED_FIELDS = ("ring_name", "image")
+BATCH_SIZE = 5000
+
+
+def new_product_code():
+    return f"TT-{uuid.uuid4().hex[:10].upper()}"
+
+
+def validate_entry(entry, check_images=False):
+    """Return a cleaned copy of entry, or raise ValueError describing the problem."""
+    if not isinstance(entry, dict):
+        raise ValueError("row is not an object")
+    cleaned = {}
+    for key, value in entry.items():
+        if key is None:
+            raise ValueError("row has more columns than the header")
+        key = key.strip()
+        if isinstance(value, str):
+            value = value.strip()
+        if key and value not in ("", None):
+            cleaned[key] = value
+    for field in REQUIRED_FIELDS:
+        if not cleaned.get(field):
+            raise ValueError(f"missing {field}")
+    if check_images and not os.path.isfile(cleaned["image"]):
+        raise ValueError(f"image not found: {cleaned['image']}")
+    locked = cleaned.get("locked", False)
+    if isinstance(locked, str):
+        locked = locked.lower() in ("1", "true", "yes", "y")
+    cleaned["locked"] = bool(locked)
+    return cleaned
+
+
+def read_rows(path):
+    """Stream (row_number, row) pairs from a .csv or .jsonl/.json-lines file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as file:
+            for number, row in enumerate(csv.DictReader(file), start=2):
+                yield number, row
+        return
+    with open(path, encoding="utf-8") as file:
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, ValueError(f"invalid JSON: {e.msg}")
+
+
+def import_entries(store, path, report_path=None, batch_size=BATCH_SIZE, check_images=False):
+    """Bulk-import ring entries from CSV or JSON Lines into the catalog store.
+
+    Rows are read and committed in batches of batch_size, so the file and
+    the catalog are never fully in memory. Rows without a product_code get
+    a fresh unique one; rows whose product_code already exists (in the
+    catalog or earlier in the file) are rejected. Rejected rows are written
+    to report_path (default: <path>.rejects.jsonl) with their line number
+    and reason. Imports of more than one batch run under store.bulk_load(),
+    so the search indexes are rebuilt once instead of updated per row.
+    Returns (imported, rejected).
+    """
+    report_path = report_path or f"{os.path.splitext(path)[0]}.rejects.jsonl"
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    report = JsonlStore(report_path)
+    imported = rejected = 0
+    rows = read_rows(path)
+    with ExitStack() as bulk:
+        batches = 0
+        while True:
+            chunk = list(islice(rows, batch_size))
+            if not chunk:
+                break
+            batches += 1
+            if batches == 2:
+                bulk.enter_context(store.bulk_load())
+            imported_batch, rejected_batch = _import_batch(store, chunk, report, check_images)
+            imported += imported_batch
+            rejected += rejected_batch
+    return imported, rejected
+
+
+def _import_batch(store, chunk, report, check_images):
+    """Validate and insert one batch of (line, row) pairs. Returns (imported, rejected)."""
+    imported = rejected = 0
+    valid = []
+    for number, row in chunk:
+        try:
+            if isinstance(row, Exception):
+                raise row
+            valid.append((number, validate_entry(row, check_images), row))
+        except ValueError as e:
+            report.append({"line": number, "error": str(e), "row": row if isinstance(row, dict) else None})
+            rejected += 1
+
+    taken = store.existing(entry["product_code"] for _, entry, _ in valid if "product_code" in entry)
+    batch = []
+    for number, entry, row in valid:
+        code = entry.get("product_code")
+        if code is None:
+            code = new_product_code()
+            while code in taken or code in store:
+                code = new_product_code()
+            entry["product_code"] = code
+        elif code in taken:
+            report.append({"line": number, "error": f"duplicate product_code {code}", "row": row})
+            rejected += 1
+            continue
+        taken.add(code)
+        batch.append(entry)
+
+    try:
+        imported += store.insert_many(batch)
+    except sqlite3.IntegrityError:
+        # Another writer took a code since we checked; fall back to row by row.
+        for entry in batch:
+            try:
+                imported += store.insert_many([entry])
+            except sqlite3.IntegrityError:
+                report.append({"line": None, "error": f"duplicate product_code {entry['product_code']}", "row": entry})
+                rejected += 1
+    return imported, rejected
@@ -0,0 +1,580 @@
+import os
+import sys
+import json
+import heapq
+import sqlite3
+import tempfile
+from operator import itemgetter
+from itertools import repeat
+from collections import Counter
+from contextlib import contextmanager
+
+from text_index import tokenize, term_counts, prefix_bounds
+
+# Fields that are flags or paths rather than searchable text.
+UNINDEXED_FIELDS = {"locked", "image"}
+
+# search() drives match="all" from a token matching at most this many entries.
+RARE_TERM_DF = 2000
+# ...and otherwise reads postings level by level if the tokens expand to at most this many terms.
+MAX_LEVEL_TERMS = 8
+
+# Entries handled per statement batch when the whole inverted index is rebuilt.
+REINDEX_BATCH = 5000
+
+# How often update() retries a read-modify-write that lost a race.
+UPDATE_RETRIES = 20
+
+
+class VersionConflict(Exception):
+    """Raised when an entry changed since the version the caller read."""
+
+
+class CatalogStore:
+    """SQLite-backed catalog keyed on product_code.
+
+    The connection is opened lazily on first use, so importing Items.py or
+    building a store costs nothing until the catalog is actually touched.
+
+    Every entry carries a version number that is bumped on each write.
+    update() is a compare-and-swap on that version, so several processes can
+    edit different entries concurrently and conflicting edits of the same
+    entry are detected instead of silently lost.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Wait for other writers instead of failing with "database is locked".
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA cache_size=-65536")  # 64 MiB keeps index pages hot during bulk writes
+            self._create_schema()
+        return self._conn
+
+    def _create_schema(self):
+        # The inverted index is keyed in score order; rebuild it if this catalog predates that.
+        tf_key = [row[5] for row in self._conn.execute("PRAGMA table_info(terms)") if row[1] == "tf"]
+        current = tf_key == [3]
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " product_code TEXT PRIMARY KEY,"
+                " data TEXT NOT NULL,"
+                " version INTEGER NOT NULL DEFAULT 1"
+                ") WITHOUT ROWID"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+            if "version" not in columns:
+                self._conn.execute("ALTER TABLE entries ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            if not current:
+                for table in ("terms", "term_totals", "term_df"):
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            # Inverted index: one row per (term, field, entry) with its frequency, highest first,
+            # so a one-term search reads only the rows it returns.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS terms ("
+                " term TEXT NOT NULL,"
+                " field TEXT NOT NULL,"
+                " product_code TEXT NOT NULL,"
+                " tf INTEGER NOT NULL,"
+                " PRIMARY KEY (term, field, tf DESC, product_code)"
+                ") WITHOUT ROWID"
+            )
+            # An entry's postings (covering, with field and tf from the key), to look up or remove them.
+            # Also restores the index if a bulk_load() was interrupted.
+            self._conn.execute("CREATE INDEX IF NOT EXISTS terms_by_entry ON terms (product_code, term)")
+            # The same postings summed over all fields, for searches not scoped to a field.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS term_totals ("
+                " term TEXT NOT NULL,"
+                " tf INTEGER NOT NULL,"
+                " product_code TEXT NOT NULL,"
+                " PRIMARY KEY (term, tf DESC, product_code)"
+                ") WITHOUT ROWID"
+            )
+            # Document frequency per (term, field); field '' counts entries matching in any field.
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS term_df ("
+                " term TEXT NOT NULL,"
+                " field TEXT NOT NULL,"
+                " df INTEGER NOT NULL,"
+                " PRIMARY KEY (term, field)"
+                ") WITHOUT ROWID"
+            )
+        if not current:
+            self.reindex()
+
+    def reindex(self):
+        """Rebuild the inverted index from scratch (only needed after upgrades)."""
+        with self._conn:
+            self._conn.execute("DELETE FROM terms")
+            self._conn.execute("DELETE FROM term_totals")
+            self._conn.execute("DELETE FROM term_df")
+            self._conn.execute("DROP INDEX IF EXISTS terms_by_entry")
+            cursor = self._conn.execute("SELECT data FROM entries")
+            for chunk in iter(lambda: cursor.fetchmany(REINDEX_BATCH), []):
+                self._add_postings([json.loads(data) for (data,) in chunk])
+            self._conn.execute("CREATE INDEX terms_by_entry ON terms (product_code, term)")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def __contains__(self, product_code):
+        row = self.conn.execute(
+            "SELECT 1 FROM entries WHERE product_code = ?", (product_code,)
+        ).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        """Stream entries in product_code order without materializing them."""
+        cursor = self.conn.execute("SELECT data FROM entries ORDER BY product_code")
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def get(self, product_code):
+        """Return the entry for product_code, or None."""
+        row = self.conn.execute(
+            "SELECT data FROM entries WHERE product_code = ?", (product_code,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_versioned(self, product_code):
+        """Return (entry, version) for product_code, or (None, None)."""
+        row = self.conn.execute(
+            "SELECT data, version FROM entries WHERE product_code = ?", (product_code,)
+        ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, None)
+
+    def put(self, entry):
+        """Insert or replace a single entry."""
+        with self.conn:
+            self._write(entry)
+
+    def put_many(self, entries):
+        """Insert or replace entries in one transaction. Returns the count."""
+        count = 0
+        with self.conn:
+            for entry in entries:
+                self._write(entry)
+                count += 1
+        return count
+
+    def insert_many(self, entries):
+        """Insert new entries in one transaction, faster than put_many for bulk loads.
+
+        Raises sqlite3.IntegrityError (and rolls back) if a product_code
+        already exists. Returns the count.
+        """
+        entries = list(entries)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO entries (product_code, data) VALUES (?, ?)",
+                ((entry["product_code"], json.dumps(entry)) for entry in entries),
+            )
+            self._add_postings(entries)
+        return len(entries)
+
+    @contextmanager
+    def bulk_load(self):
+        """Drop the per-entry postings index over a run of insert_many() calls and rebuild it once at the end.
+
+        Building the index in one sorted pass is much cheaper than updating
+        it row by row. Searches stay correct meanwhile, only slower; an
+        interrupted load gets the index back when the catalog is next opened.
+        """
+        with self.conn:
+            self.conn.execute("DROP INDEX IF EXISTS terms_by_entry")
+        try:
+            yield self
+        finally:
+            with self.conn:
+                self.conn.execute("CREATE INDEX IF NOT EXISTS terms_by_entry ON terms (product_code, term)")
+
+    def existing(self, product_codes):
+        """Return the subset of product_codes already in the catalog."""
+        codes = list(product_codes)
+        found = set()
+        for start in range(0, len(codes), 500):
+            chunk = codes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            found.update(
+                row[0] for row in self.conn.execute(
+                    f"SELECT product_code FROM entries WHERE product_code IN ({placeholders})", chunk
+                )
+            )
+        return found
+
+    def update(self, product_code, changes, expected_version=None):
+        """Apply changes to a single entry in place. Returns the new entry or None.
+
+        With expected_version, the write only happens if the entry is still at
+        that version, otherwise VersionConflict is raised. Without it, the
+        read-modify-write is retried until it applies to the latest version.
+        """
+        for _ in range(UPDATE_RETRIES):
+            entry, version = self.get_versioned(product_code)
+            if entry is None:
+                return None
+            if expected_version is not None and version != expected_version:
+                raise VersionConflict(f"{product_code} is at version {version}, not {expected_version}")
+            entry.update(changes)
+            with self.conn:
+                cursor = self.conn.execute(
+                    "UPDATE entries SET data = ?, version = version + 1"
+                    " WHERE product_code = ? AND version = ?",
+                    (json.dumps(entry), product_code, version),
+                )
+                if cursor.rowcount:
+                    self._unindex(product_code)
+                    self._index(entry)
+                    return entry
+            if expected_version is not None:
+                raise VersionConflict(f"{product_code} changed while it was being updated")
+        raise VersionConflict(f"{product_code} kept changing; gave up after {UPDATE_RETRIES} attempts")
+
+    def delete(self, product_code):
+        with self.conn:
+            self._unindex(product_code)
+            cursor = self.conn.execute(
+                "DELETE FROM entries WHERE product_code = ?", (product_code,)
+            )
+        return cursor.rowcount > 0
+
+    def get_many(self, product_codes):
+        """Return the entries for product_codes, in the same order, skipping missing ones."""
+        codes = list(product_codes)
+        found = {}
+        for start in range(0, len(codes), 500):
+            chunk = codes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for code, data in self.conn.execute(
+                f"SELECT product_code, data FROM entries WHERE product_code IN ({placeholders})", chunk
+            ):
+                found[code] = json.loads(data)
+        return [found[code] for code in codes if code in found]
+
+    def _source(self, field):
+        """(table, scope SQL, scope params) of the postings for field, or summed over all fields."""
+        if field:
+            return "terms", "field = ? AND ", [field]
+        return "term_totals", "", []
+
+    def _term_group(self, token, field, prefix):
+        """Resolve a query token to (df, clause, params, terms).
+
+        clause/params match it in SQL and terms are the indexed terms it
+        stands for (several if it is a prefix). df is the number of entries
+        containing it: exact for a single term, an upper bound for several.
+        """
+        if prefix:
+            low, high = prefix_bounds(token)
+            rows = self.conn.execute(
+                "SELECT term, df FROM term_df WHERE field = ? AND term >= ? AND term < ? AND df > 0",
+                (field or "", low, high),
+            ).fetchall()
+            if len(rows) != 1:
+                return sum(df for _, df in rows), "term >= ? AND term < ?", [low, high], [term for term, _ in rows]
+            token = rows[0][0]
+        row = self.conn.execute(
+            "SELECT df FROM term_df WHERE field = ? AND term = ?", (field or "", token)
+        ).fetchone()
+        return (row[0] if row else 0), "term = ?", [token], [token]
+
+    def _lookup(self, clause, params, field, codes):
+        """Yield (product_code, term, tf) for the terms matching clause in the given entries only.
+
+        Reads the per-entry index, so the cost depends on len(codes), not on
+        how common the terms are. tf is summed over fields unless field is given.
+        """
+        if field:
+            sql, group = f"SELECT product_code, term, tf FROM terms WHERE field = ? AND {clause}", ""
+            params = [field] + params
+        else:
+            sql, group = f"SELECT product_code, term, SUM(tf) FROM terms WHERE {clause}", " GROUP BY product_code, term"
+        codes = list(codes)
+        for start in range(0, len(codes), 500):
+            chunk = codes[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            yield from self.conn.execute(f"{sql} AND product_code IN ({placeholders}){group}", params + chunk)
+
+    def _postings(self, group, field, codes=None):
+        """Yield (product_code, tf) rows for a term group, only for codes if given."""
+        if codes is not None:
+            for code, _, tf in self._lookup(group[1], group[2], field, codes):
+                yield code, tf
+            return
+        table, scope, params = self._source(field)
+        yield from self.conn.execute(f"SELECT product_code, tf FROM {table} WHERE {scope}{group[1]}", params + group[2])
+
+    def _top_from_rarest(self, groups, field, count):
+        """match="all" driven by the rarest group: read its postings, look up only those entries for the rest."""
+        scores = {}
+        for code, tf in self._postings(groups[0], field):
+            scores[code] = scores.get(code, 0) + tf
+        for group in groups[1:]:
+            if not scores:
+                return []
+            # Look up the candidates when there are fewer of them than entries matching this group.
+            candidates = scores if len(scores) < group[0] else None
+            found = {}
+            for code, tf in self._postings(group, field, candidates):
+                if code in scores:
+                    found[code] = found.get(code, 0) + tf
+            scores = {code: scores[code] + tf for code, tf in found.items()}
+        return heapq.nsmallest(count, scores, key=lambda code: (-scores[code], code))
+
+    def _top_by_level(self, groups, field, count):
+        """match="all" reading postings from the highest tf down.
+
+        After every posting with tf >= level has been read, an entry not yet
+        seen has tf < level for every term, so it scores at most
+        (level - 1) per term. Once count entries score more than that the
+        top count is final, so common terms stop after a few high-tf levels
+        instead of reading every posting.
+        """
+        table, scope, params = self._source(field)
+        owners = {}
+        for position, group in enumerate(groups):
+            for term in group[3]:
+                owners.setdefault(term, []).append(position)  # a term may serve several tokens
+        terms = list(owners)
+        bound = sum(len(owned) for owned in owners.values())
+        placeholders = ",".join("?" * len(terms))
+        top = max(
+            self.conn.execute(
+                f"SELECT tf FROM {table} WHERE {scope}term = ? ORDER BY tf DESC LIMIT 1", params + [term]
+            ).fetchone()[0]
+            for term in terms
+        )
+        scores = {}
+        ranked = []
+        for level in range(top, 0, -1):
+            new = set()
+            for term in terms:
+                for (code,) in self.conn.execute(
+                    f"SELECT product_code FROM {table} WHERE {scope}term = ? AND tf = ?", params + [term, level]
+                ):
+                    if code not in scores:
+                        new.add(code)
+            if new:
+                totals = dict.fromkeys(new, 0)
+                matched = {code: set() for code in new}
+                for code, term, tf in self._lookup(f"term IN ({placeholders})", terms, field, new):
+                    totals[code] += tf * len(owners[term])
+                    matched[code].update(owners[term])
+                for code in new:
+                    scores[code] = totals[code] if len(matched[code]) == len(groups) else None
+                ranked = heapq.nsmallest(count, (code for code in scores if scores[code] is not None),
+                                         key=lambda code: (-scores[code], code))
+            if len(ranked) == count and scores[ranked[-1]] > bound * (level - 1):
+                break
+        return ranked
+
+    def _top_by_sql(self, groups, field, match, count):
+        """Score every matching posting in SQL; the general case (match="any", several common prefixes)."""
+        table, scope, scope_params = self._source(field)
+        branches = []
+        params = []
+        for position, group in enumerate(groups):
+            branches.append(f"SELECT ? AS k, product_code, tf FROM {table} WHERE {scope}{group[1]}")
+            params += [position] + scope_params + group[2]
+        sql = (
+            "SELECT product_code, COUNT(DISTINCT k) AS matched, SUM(tf) AS score"
+            f" FROM ({' UNION ALL '.join(branches)}) GROUP BY product_code"
+        )
+        if match == "all":
+            sql += " HAVING matched = ?"
+            params.append(len(groups))
+        sql += " ORDER BY matched DESC, score DESC, product_code LIMIT ?"
+        params.append(count)
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def search(self, query, field=None, match="all", prefix=True, limit=20, offset=0):
+        """Ranked full-text search over the inverted index.
+
+        Every query token must match (match="all") or at least one must
+        (match="any"). With prefix=True the last token also matches longer
+        terms, so "gol" finds "gold". Results are ordered by the number of
+        matched tokens, then by term frequency, and paginated with
+        limit/offset.
+
+        Each token's document frequency decides the plan: a one-term query
+        reads its postings in score order and stops at limit, and
+        match="all" starts from a rare token if there is one, otherwise
+        reads the postings of all tokens from the highest frequency down
+        until the top results are settled.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        groups = [
+            self._term_group(token, field, prefix and position == len(tokens) - 1)
+            for position, token in enumerate(tokens)
+        ]
+        if match == "all" and not all(group[0] for group in groups):
+            return []
+        groups = [group for group in groups if group[0]]
+        if not groups:
+            return []
+        count = offset + limit
+
+        if len(groups) == 1 and len(groups[0][3]) == 1:
+            table, scope, params = self._source(field)
+            codes = [row[0] for row in self.conn.execute(
+                f"SELECT product_code FROM {table} WHERE {scope}term = ?"
+                " ORDER BY tf DESC, product_code LIMIT ? OFFSET ?",
+                params + [groups[0][3][0], limit, offset],
+            )]
+            return self.get_many(codes)
+        if match == "all" or len(groups) == 1:
+            groups.sort(key=lambda group: group[0])
+            if groups[0][0] <= RARE_TERM_DF:
+                ranked = self._top_from_rarest(groups, field, count)
+            elif sum(len(group[3]) for group in groups) <= MAX_LEVEL_TERMS:
+                ranked = self._top_by_level(groups, field, count)
+            else:
+                ranked = self._top_by_sql(groups, field, match, count)
+        else:
+            ranked = self._top_by_sql(groups, field, match, count)
+        return self.get_many(ranked[offset:])
+
+    def _write(self, entry):
+        if "product_code" not in entry:
+            raise ValueError("Catalog entries require a product_code.")
+        self.conn.execute(
+            "INSERT INTO entries (product_code, data) VALUES (?, ?)"
+            " ON CONFLICT (product_code) DO UPDATE SET data = excluded.data, version = version + 1",
+            (entry["product_code"], json.dumps(entry)),
+        )
+        self._unindex(entry["product_code"])
+        self._index(entry)
+
+    def _term_rows(self, entry):
+        for field, value in entry.items():
+            if field in UNINDEXED_FIELDS or isinstance(value, bool):
+                continue
+            for term, tf in term_counts(value).items():
+                yield term, field, entry["product_code"], tf
+
+    def _count_terms(self, counts, delta=1):
+        """Add delta times counts[(term, field)] to the document frequency of each (term, field)."""
+        self.conn.executemany(
+            "INSERT INTO term_df (term, field, df) VALUES (?, ?, ?)"
+            " ON CONFLICT (term, field) DO UPDATE SET df = df + excluded.df",
+            ((term, field, count * delta) for (term, field), count in counts.items()),
+        )
+
+    def _add_postings(self, entries):
+        """Write the terms, per-entry totals and document frequencies of entries, tokenizing each entry once."""
+        rows, totals = [], []
+        for entry in entries:
+            code = entry["product_code"]
+            summed = {}
+            for term, field, _, tf in self._term_rows(entry):
+                rows.append((term, field, code, tf))
+                summed[term] = summed.get(term, 0) + tf
+            totals.extend([(term, tf, code) for term, tf in summed.items()])
+        # No need to sort: a batch only appends at a few hundred (term, field, tf) positions, which stay cached.
+        self.conn.executemany("INSERT INTO terms (term, field, product_code, tf) VALUES (?, ?, ?, ?)", rows)
+        self.conn.executemany("INSERT INTO term_totals (term, tf, product_code) VALUES (?, ?, ?)", totals)
+        counts = Counter(map(itemgetter(0, 1), rows))
+        counts.update(zip(map(itemgetter(0), totals), repeat("")))
+        self._count_terms(counts)
+
+    def _index(self, entry):
+        self._add_postings([entry])
+
+    def _unindex(self, product_code):
+        rows = self.conn.execute(
+            "SELECT term, field, tf FROM terms WHERE product_code = ?", (product_code,)
+        ).fetchall()
+        if rows:
+            totals = {}
+            for term, _, tf in rows:
+                totals[term] = totals.get(term, 0) + tf
+            self.conn.execute("DELETE FROM terms WHERE product_code = ?", (product_code,))
+            self.conn.executemany(
+                "DELETE FROM term_totals WHERE term = ? AND tf = ? AND product_code = ?",
+                ((term, tf, product_code) for term, tf in totals.items()),
+            )
+            counts = Counter(map(itemgetter(0, 1), rows))
+            counts.update(zip(totals, repeat("")))
+            self._count_terms(counts, -1)
+
+
+def migrate_from_json(json_path, db_path, report_path=None):
+    """One-shot import of a legacy catalog.json into a CatalogStore.
+
+    Entries that are not objects or lack a product_code are skipped and
+    written to report_path (default: <json_path>.rejects.jsonl) with their
+    position and reason. A new database is built under a temporary name and
+    renamed into place only once complete, so a failed migration leaves no
+    half-filled catalog.db behind and is retried next time. Into an
+    existing database, rows with the same product_code are replaced in one
+    transaction. Returns (migrated, rejected).
+    """
+    from jsonl_store import JsonlStore
+
+    with open(json_path, "r") as file:
+        entries = json.load(file)
+    if not isinstance(entries, list):
+        raise ValueError(f"{json_path} does not hold a list of entries")
+    report_path = report_path or f"{os.path.splitext(json_path)[0]}.rejects.jsonl"
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    valid, rejects = [], []
+    for number, entry in enumerate(entries, start=1):
+        if not isinstance(entry, dict):
+            rejects.append({"line": number, "error": "entry is not an object", "row": None})
+        elif not entry.get("product_code"):
+            rejects.append({"line": number, "error": "missing product_code", "row": entry})
+        else:
+            valid.append(entry)
+    if rejects:
+        JsonlStore(report_path).extend(rejects)
+
+    if os.path.exists(db_path):
+        store = CatalogStore(db_path)
+        try:
+            return store.put_many(valid), len(rejects)
+        finally:
+            store.close()
+
+    directory = os.path.dirname(db_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".db")
+    os.close(fd)
+    store = CatalogStore(temp_path)
+    try:
+        migrated = store.put_many(valid)
+        store.close()  # checkpoints the WAL into the database file
+        os.replace(temp_path, db_path)
+    except BaseException:
+        store.close()
+        for path in (temp_path, temp_path + "-wal", temp_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return migrated, len(rejects)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python catalog_store.py <catalog.json> <catalog.db>")
+        sys.exit(1)
+    migrated, rejected = migrate_from_json(sys.argv[1], sys.argv[2])
+    print(f"Migrated {migrated} entries into {sys.argv[2]}, rejected {rejected}")
@@ -0,0 +1,170 @@
+import os
+import json
+import hashlib
+import threading
+
+import metrics
+from text_index import InvertedIndex
+
+# Hex digits in an item ID: 64 bits, so distinct items in even very large pools do not collide.
+ID_LENGTH = 16
+# IDs used to be 8 hex digits; get() still accepts one if it names a single item.
+LEGACY_ID_LENGTH = 8
+
+
+def _signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def item_id(item):
+    """Stable short ID for a content item, derived from its value rather than its position."""
+    data = json.dumps(item, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()[:ID_LENGTH]
+
+
+def item_text(item):
+    """Searchable text for an item: the string itself, or a dict's values."""
+    if isinstance(item, dict):
+        return " ".join(str(value) for value in item.values())
+    return str(item)
+
+
+class _IndexedItems:
+    """ID lookup and keyword search over a pool's cached items.
+
+    Both are built on first use and extended in place as items are added.
+    The list, ID map and index are built in locals and swapped in together
+    under a lock, so threads sharing a pool never see a half-built cache.
+    """
+
+    _items = None
+    _by_id = None
+    _index = None
+
+    def __init__(self):
+        self._lock = threading.RLock()
+
+    def _reset(self, items):
+        self._items = items
+        self._by_id = None
+        self._index = None
+
+    def _track(self, item):
+        if self._by_id is not None:
+            self._by_id.setdefault(item_id(item), item)
+        if self._index is not None:
+            self._index.add(len(self._items) - 1, item_text(item))
+
+    def _ensure_index(self):
+        """Return (items, by_id, index), building the lookups if needed."""
+        with self._lock:
+            items = self.items
+            if self._index is None:
+                by_id = {}
+                index = InvertedIndex()
+                for position, item in enumerate(items):
+                    by_id.setdefault(item_id(item), item)
+                    index.add(position, item_text(item))
+                self._by_id, self._index = by_id, index
+            return items, self._by_id, self._index
+
+    def get(self, key):
+        """Return the item with the given ID (or a legacy 8-digit ID naming a single item), or None."""
+        _, by_id, _ = self._ensure_index()
+        item = by_id.get(key)
+        if item is None and isinstance(key, str) and len(key) == LEGACY_ID_LENGTH:
+            matches = [item for full_id, item in by_id.items() if full_id.startswith(key)]
+            if len(matches) == 1:
+                item = matches[0]
+        return item
+
+    def search(self, query, match="all"):
+        """Return the items matching every (or any) keyword in query, in pool order."""
+        items, _, index = self._ensure_index()
+        return [items[position] for position in index.search(query, match)]
+
+
+class ContentPool(_IndexedItems):
+    """A JsonlStore-backed list that is read on first use and cached.
+
+    The cache is keyed on the file's mtime and size, so it is reparsed only
+    when the file changes on disk. append() writes through to the store and
+    updates the cached list in place instead of forcing a reload.
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self._signature = None
+
+    @property
+    def items(self):
+        self.store.migrate_legacy()
+        signature = _signature(self.store.path)
+        with self._lock:
+            if self._items is None or signature != self._signature:
+                with metrics.timer("content.load"):
+                    items = list(self.store)
+                self._reset(items)
+                self._signature = signature
+            return self._items
+
+    def exists(self):
+        return os.path.exists(self.store.path) or bool(self.store.legacy_path and os.path.exists(self.store.legacy_path))
+
+    def append(self, record):
+        self.store.migrate_legacy()
+        with self._lock:
+            fresh = self._items is not None and _signature(self.store.path) == self._signature
+            self.store.append(record)
+            if fresh:
+                self._items.append(record)
+                self._track(record)
+                self._signature = _signature(self.store.path)
+            else:
+                self._reset(None)  # changed elsewhere too; reload on next access
+
+    def invalidate(self):
+        with self._lock:
+            self._reset(None)
+
+
+class PictureDirectory(_IndexedItems):
+    """Cached listing of image files, refreshed when the directory changes."""
+
+    EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._signature = None
+
+    @property
+    def items(self):
+        signature = _signature(self.path)
+        with self._lock:
+            if self._items is None or signature != self._signature:
+                if signature is None:
+                    self._reset([])
+                else:
+                    self._reset(sorted(f for f in os.listdir(self.path) if f.endswith(self.EXTENSIONS)))
+                self._signature = signature
+            return self._items
+
+    def added(self, name):
+        """Record a file added in-process without rescanning the directory."""
+        with self._lock:
+            if self._items is None:
+                return
+            if name not in self._items:
+                self._items.append(name)
+                self._track(name)
+            self._signature = _signature(self.path)
+
+    def invalidate(self):
+        with self._lock:
+            self._reset(None)
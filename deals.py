@@ -0,0 +1,339 @@
+"""Deal normalization, expiry and indexed queries.
+
+Deals keep their display strings ("$19.99", "20%") for the post templates;
+normalize_deal() adds numeric price_value and discount_pct fields and an
+expires_at Unix timestamp. DealBook keeps sorted indexes over a deal pool
+so "top N by discount" and "deals under $X" are a bisect and a slice, and
+drops expired deals from the pool automatically.
+
+Usage:
+    python deals.py load feed.csv       # or feed.jsonl / feed.json
+    python deals.py top 10
+    python deals.py under 50
+    python deals.py purge
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import argparse
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from catalog_import import read_rows
+from content_pools import ContentPool
+from jsonl_store import JsonlStore
+
+DEALS_FILE = 'deals/deals.json'
+REQUIRED_FIELDS = ('product', 'price', 'discount', 'link')
+
+_NUMBER_RE = re.compile(r"\d[\d.,\s]*")
+
+
+def parse_price(value):
+    """Read a price such as '$1,299.99', '19,99 €' or 25 as a float. Returns None if there is no number."""
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.search(str(value))
+    if not match:
+        return None
+    number = "".join(match.group(0).split()).rstrip(".,")
+    separator = max(number.rfind("."), number.rfind(","))
+    if separator == -1:
+        return float(number)
+    # A separator followed by one or two digits is the decimal point; any other is a thousands separator.
+    if len(number) - separator - 1 in (1, 2):
+        return float(number[:separator].replace(",", "").replace(".", "") + "." + number[separator + 1:])
+    return float(number.replace(",", "").replace(".", ""))
+
+
+def parse_discount(value, price=None):
+    """Read a discount as a percentage.
+
+    '20%', '20 % off' and 20 are 20 percent. An amount such as '$5 off' is
+    converted using price (the discounted price): 5 / (price + 5). Returns
+    None if the discount cannot be read.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        percent = float(value)
+    elif "%" in str(value):
+        percent = parse_price(str(value).split("%", 1)[0])
+    else:
+        amount = parse_price(value)
+        if amount is None or not price:
+            return None
+        percent = amount / (price + amount) * 100
+    if percent is None:
+        return None
+    return round(min(max(percent, 0.0), 100.0), 2)
+
+
+def parse_expiry(value):
+    """Read an expiry as a Unix timestamp: a number, or 'YYYY-MM-DD[ HH:MM[:SS]]'. None means never."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).strip()).timestamp()
+    except ValueError:
+        raise ValueError(f"unreadable expiry: {value}") from None
+
+
+def normalize_deal(deal):
+    """Return a cleaned copy of deal with numeric fields added, or raise ValueError.
+
+    Fields already normalized are kept, so normalizing twice is a no-op.
+    """
+    if not isinstance(deal, dict):
+        raise ValueError("deal is not an object")
+    cleaned = {}
+    for key, value in deal.items():
+        if key is None:
+            raise ValueError("row has more columns than the header")
+        if isinstance(value, str):
+            value = value.strip()
+        if value not in ("", None):
+            cleaned[key.strip()] = value
+    for field in REQUIRED_FIELDS:
+        if field not in cleaned:
+            raise ValueError(f"missing {field}")
+    if cleaned.get('price_value') is None:
+        cleaned['price_value'] = parse_price(cleaned['price'])
+        if cleaned['price_value'] is None:
+            raise ValueError(f"unreadable price: {cleaned['price']}")
+    if cleaned.get('discount_pct') is None:
+        cleaned['discount_pct'] = parse_discount(cleaned['discount'], cleaned['price_value'])
+        if cleaned['discount_pct'] is None:
+            raise ValueError(f"unreadable discount: {cleaned['discount']}")
+    expires = cleaned.pop('expires', None)
+    if cleaned.get('expires_at') is None and expires is not None:
+        cleaned['expires_at'] = parse_expiry(expires)
+    elif 'expires_at' in cleaned:
+        cleaned['expires_at'] = parse_expiry(cleaned['expires_at'])
+    return cleaned
+
+
+def deal_key(deal):
+    """What identifies a deal across feed updates: its link, or its product if there is no link."""
+    return deal.get('link') or deal.get('product')
+
+
+def is_expired(deal, now):
+    try:
+        expires_at = parse_expiry(deal.get('expires_at') or deal.get('expires'))
+    except (ValueError, AttributeError):
+        return False
+    return expires_at is not None and expires_at <= now
+
+
+class DealBook:
+    """Sorted indexes over a deal pool, rebuilt only when the pool changes.
+
+    Queries return the pool's own deal records (so item IDs stay stable),
+    never expired ones: the first query after a deal expires rewrites the
+    pool without it. Deals whose price or discount cannot be read are
+    left out of the indexes but stay in the pool.
+    """
+
+    def __init__(self, pool, clock=time.time):
+        self.pool = pool
+        self.clock = clock
+        self._key = None
+
+    def _ensure_index(self):
+        items = self.pool.items
+        key = (id(items), len(items))
+        if key == self._key:
+            return items
+        by_discount, by_price, expiries = [], [], []
+        for position, deal in enumerate(items):
+            try:
+                if isinstance(deal, dict) and 'price_value' in deal and 'discount_pct' in deal:
+                    normalized = deal  # stored normalized; skip re-parsing
+                else:
+                    normalized = normalize_deal(deal)
+                price, discount = float(normalized['price_value']), float(normalized['discount_pct'])
+                expires_at = parse_expiry(normalized.get('expires_at'))
+            except (ValueError, TypeError):
+                continue
+            by_discount.append((-discount, position))
+            by_price.append((price, position))
+            if expires_at is not None:
+                expiries.append(expires_at)
+        by_discount.sort()
+        by_price.sort()
+        self._discount_order = [position for _, position in by_discount]
+        self._prices = [price for price, _ in by_price]
+        self._price_order = [position for _, position in by_price]
+        self._expiries = sorted(expiries)
+        self._key = key
+        return items
+
+    def purge_expired(self):
+        """Drop expired deals from the pool. Returns how many were dropped (0 is an O(1) check)."""
+        self._ensure_index()
+        now = self.clock()
+        expired = bisect_right(self._expiries, now)
+        if expired:
+            self.pool.store.compact(keep=lambda deal: not is_expired(deal, now))
+            self.pool.invalidate()
+            self._key = None
+        return expired
+
+    def active(self):
+        """All deals that have not expired."""
+        self.purge_expired()
+        return self.pool.items
+
+    def top_by_discount(self, n=10):
+        """The n deals with the highest discount, best first."""
+        self.purge_expired()
+        items = self._ensure_index()
+        return [items[position] for position in self._discount_order[:n]]
+
+    def in_price_range(self, low=None, high=None, limit=None):
+        """Deals priced between low and high (inclusive, either may be None), cheapest first."""
+        self.purge_expired()
+        items = self._ensure_index()
+        start = 0 if low is None else bisect_left(self._prices, low)
+        end = len(self._prices) if high is None else bisect_right(self._prices, high)
+        if limit is not None:
+            end = min(end, start + limit)
+        return [items[position] for position in self._price_order[start:end]]
+
+    def under_price(self, max_price, limit=None):
+        """Deals costing at most max_price, cheapest first."""
+        return self.in_price_range(high=max_price, limit=limit)
+
+
+def read_feed(path):
+    """Stream (line, row) pairs from a .csv, .jsonl or .json (array) deal feed."""
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        if isinstance(data, dict):
+            data = data.get('deals', [])
+        yield from enumerate(data, start=1)
+        return
+    yield from read_rows(path)
+
+
+def load_feed(pool, path, report_path=None, now=None):
+    """Bulk-load a deal feed into pool, streaming it in one locked append.
+
+    Rows are normalized; invalid, expired and repeated (same link, or same
+    product without a link) rows are rejected to report_path (default:
+    <path>.rejects.jsonl). A row for a deal already in the pool replaces
+    it. Returns (added, updated, rejected).
+    """
+    now = time.time() if now is None else now
+    report_path = report_path or f"{os.path.splitext(path)[0]}.rejects.jsonl"
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    report = JsonlStore(report_path)
+    existing = {deal_key(deal) for deal in pool.items if isinstance(deal, dict)}
+    seen = set()
+    replaced = set()
+    counts = {'rejected': 0}
+
+    def reject(number, error, row):
+        report.append({"line": number, "error": error, "row": row if isinstance(row, dict) else None})
+        counts['rejected'] += 1
+
+    def accepted():
+        for number, row in read_feed(path):
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                deal = normalize_deal(row)
+            except ValueError as e:
+                reject(number, str(e), row)
+                continue
+            key = deal_key(deal)
+            if key in seen:
+                reject(number, f"duplicate deal {key}", row)
+                continue
+            if deal.get('expires_at') is not None and deal['expires_at'] <= now:
+                reject(number, "expired", row)
+                continue
+            seen.add(key)
+            if key in existing:
+                replaced.add(key)
+            yield deal
+
+    written = pool.store.extend(accepted())
+    if replaced:
+        # Drop the older record of each replaced deal; the new one comes after it in the file.
+        stale = set(replaced)
+
+        def keep(deal):
+            key = deal_key(deal) if isinstance(deal, dict) else None
+            if key in stale:
+                stale.discard(key)
+                return False
+            return True
+
+        pool.store.compact(keep=keep)
+    pool.invalidate()
+    return written - len(replaced), len(replaced), counts['rejected']
+
+
+def describe(deal):
+    text = f"{deal['product']} - {deal['price']} ({deal['discount']})"
+    try:
+        expires_at = parse_expiry(deal.get('expires_at'))
+    except ValueError:
+        expires_at = None
+    if expires_at is not None:
+        text += f", until {datetime.fromtimestamp(expires_at):%Y-%m-%d %H:%M}"
+    return text
+
+
+def deal_pool(base_dir='TwinkleTones'):
+    legacy_path = os.path.join(base_dir, DEALS_FILE)
+    return ContentPool(JsonlStore(os.path.splitext(legacy_path)[0] + '.jsonl', legacy_path=legacy_path,
+                                  legacy_key='deals'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load and query deals.")
+    parser.add_argument('--dir', default='TwinkleTones', help="TwinkleTones data directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    load = commands.add_parser('load', help="bulk-load a CSV, JSON Lines or JSON deal feed")
+    load.add_argument('path')
+    top = commands.add_parser('top', help="deals with the highest discount")
+    top.add_argument('n', type=int, nargs='?', default=10)
+    under = commands.add_parser('under', help="deals at or below a price")
+    under.add_argument('price', type=float)
+    under.add_argument('--limit', type=int)
+    commands.add_parser('purge', help="drop expired deals")
+    args = parser.parse_args(argv)
+
+    pool = deal_pool(args.dir)
+    book = DealBook(pool)
+    if args.command == 'load':
+        if not os.path.exists(args.path):
+            print(f"File not found: {args.path}")
+            return 1
+        added, updated, rejected = load_feed(pool, args.path)
+        print(f"Added {added} deals, updated {updated}, rejected {rejected}.")
+    elif args.command == 'purge':
+        print(f"Dropped {book.purge_expired()} expired deal(s).")
+    else:
+        deals = book.top_by_discount(args.n) if args.command == 'top' else book.under_price(args.price, args.limit)
+        for deal in deals:
+            print(describe(deal))
+        if not deals:
+            print("No deals found.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""Concurrent posting with asyncio over a pluggable transport (see transports.py).
+
+Dispatcher posts many posts at once: at most `concurrency` in flight,
+optionally no more than `rate` started per second, with retries and
+exponential backoff. Every post gets a result record with its status,
+attempts and latency, and summarize() turns those into throughput and
+p50/p90/p99 latency.
+
+Usage:
+    python dispatch.py bench --posts 1000 --concurrency 50 [--rate 200]
+                       [--transport mock|http] [--latency 0.05] [--url URL]
+                       [--report latencies.jsonl]
+    python dispatch.py serve --port 8765 --latency 0.05
+    TT_FB_EMAIL=... TT_FB_PASSWORD=... python dispatch.py queue queue.jsonl --concurrency 4
+    python dispatch.py queue queue.jsonl --transport http --url https://example.com/posts
+
+`bench` runs against a local MockServer (or MockTransport, or --url) so
+posting throughput can be measured without a live service. `queue` posts
+a batch.py queue file and saves every post that went out.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+
+import metrics
+from jsonl_store import JsonlStore
+from transports import HttpTransport, MockServer, MockTransport, SeleniumTransport
+
+
+class RateLimiter:
+    """Token bucket: on average at most rate acquisitions per second, in bursts of up to burst."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = burst
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = self.clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Dispatcher:
+    """Posts through transport concurrently. See run()."""
+
+    def __init__(self, transport, concurrency=10, rate=None, burst=1, retries=0, backoff=2.0, on_result=None):
+        self.transport = transport
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.on_result = on_result
+
+    async def _post(self, number, post, limiter):
+        result = {'id': post.get('id', number), 'status': 'failed', 'attempts': 0, 'latency': None, 'error': None}
+        for attempt in range(1, self.retries + 2):
+            result['attempts'] = attempt
+            if limiter is not None:
+                await limiter.acquire()
+            start = time.perf_counter()
+            try:
+                with metrics.timer('dispatch.send'):
+                    await self.transport.send(post)
+            except Exception as e:
+                result['latency'] = round(time.perf_counter() - start, 6)
+                result['error'] = f"{e.__class__.__name__}: {e}"
+                if attempt <= self.retries:
+                    metrics.count('dispatch.retries')
+                    # Exponential backoff with jitter so failed posts do not retry in lockstep.
+                    await asyncio.sleep(self.backoff ** attempt * (0.5 + random.random()))
+                continue
+            result.update(status='posted', latency=round(time.perf_counter() - start, 6), error=None)
+            break
+        return result
+
+    async def run(self, posts):
+        """Post every post in posts (any iterable, read lazily). Returns the results in completion order.
+
+        latency is how long the last attempt took, excluding time spent
+        waiting for a free slot or for the rate limit.
+        """
+        limiter = RateLimiter(self.rate, self.burst) if self.rate else None
+        slots = asyncio.Semaphore(self.concurrency)
+        results = []
+        running = set()
+
+        async def work(number, post):
+            try:
+                result = await self._post(number, post, limiter)
+            finally:
+                slots.release()
+            results.append(result)
+            if self.on_result is not None:
+                self.on_result(post, result)
+
+        for number, post in enumerate(posts, start=1):
+            await slots.acquire()  # only `concurrency` posts are read ahead, so huge inputs stream through
+            task = asyncio.create_task(work(number, post))
+            running.add(task)
+            task.add_done_callback(running.discard)
+        if running:
+            await asyncio.gather(*running)
+        return results
+
+    def dispatch(self, posts):
+        """Run run() to completion. Returns (results, summary)."""
+        start = time.perf_counter()
+        results = asyncio.run(self.run(posts))
+        return results, summarize(results, time.perf_counter() - start)
+
+
+def summarize(results, elapsed):
+    """Counts, throughput and latency percentiles (of posted results) for a dispatch run."""
+    latencies = sorted(result['latency'] for result in results if result['status'] == 'posted')
+    summary = {
+        'posts': len(results),
+        'posted': len(latencies),
+        'failed': len(results) - len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+    }
+    if latencies:
+        for name, fraction in (('p50_ms', 0.50), ('p90_ms', 0.90), ('p99_ms', 0.99)):
+            summary[name] = round(metrics.percentile(latencies, fraction) * 1000, 3)
+        summary['max_ms'] = round(latencies[-1] * 1000, 3)
+    return summary
+
+
+def synthetic_posts(count):
+    for number in range(1, count + 1):
+        yield {'id': number, 'content': f"Benchmark post {number} ✨", 'picture': 'bench.png', 'deal': None,
+               'scheduled_time': None}
+
+
+def run_bench(args):
+    server = None
+    if args.transport == 'mock':
+        transport = MockTransport(args.latency, failure_rate=args.failure_rate, seed=args.seed)
+    else:
+        if not args.url:
+            server = MockServer(latency=args.latency, failure_rate=args.failure_rate, seed=args.seed)
+            server.start()
+        transport = HttpTransport(args.url or server.url, size=args.concurrency)
+    dispatcher = Dispatcher(transport, args.concurrency, args.rate, args.burst, args.retries, args.backoff)
+    try:
+        results, summary = dispatcher.dispatch(synthetic_posts(args.posts))
+    finally:
+        transport.close()
+        if server is not None:
+            server.stop()
+    if isinstance(transport, HttpTransport):
+        summary['connections_opened'] = transport.connections_opened
+    if args.report:
+        written = JsonlStore(args.report).extend(results)
+        print(f"Per-post results for {written} posts written to {args.report}")
+    print(json.dumps(summary, indent=2))
+    return 0 if summary['failed'] == 0 else 2
+
+
+def post_queue(args):
+    from app import TwinkleTonesCLI
+    from batch import TIME_FORMAT, build_post
+    from browser_pool import SessionPool
+
+    app = TwinkleTonesCLI()
+    pool = None
+    if args.transport == 'selenium':
+        email = os.environ.get('TT_FB_EMAIL')
+        password = os.environ.get('TT_FB_PASSWORD')
+        if not email or not password:
+            print("Set TT_FB_EMAIL and TT_FB_PASSWORD to post with the selenium transport.")
+            return 1
+        pool = SessionPool(email, password, size=args.concurrency, home_url=app.home_url,
+                           profiles_dir=os.path.join(app.base_dir, 'browser_profiles'))
+        transport = SeleniumTransport(app, pool)
+    elif args.url:
+        transport = HttpTransport(args.url, size=args.concurrency)
+    else:
+        print("--url is required with the http transport.")
+        return 1
+    results_store = JsonlStore(args.results)
+    counts = {'invalid': 0}
+
+    def posts():
+        for spec in JsonlStore(args.queue):
+            try:
+                post_content, deal, picture, selection = build_post(app, spec)
+            except (KeyError, LookupError, ValueError, TypeError) as e:
+                results_store.append({'id': spec.get('id'), 'status': 'invalid', 'attempts': 0, 'latency': None,
+                                      'error': str(e)})
+                counts['invalid'] += 1
+                continue
+            yield {'id': spec.get('id'), 'content': post_content, 'deal': deal, 'picture': picture,
+                   'scheduled_time': time.strftime(TIME_FORMAT), 'selection': selection}
+
+    def saved(post, result):
+        if result['status'] == 'posted':
+            app.save_post(post['content'], post['deal'], post['picture'], post['scheduled_time'], post['selection'])
+        results_store.append(result)
+        print(f"[{result['status']}] job {result['id']} after {result['attempts']} attempt(s)")
+
+    dispatcher = Dispatcher(transport, args.concurrency, args.rate, args.burst, args.retries, args.backoff,
+                            on_result=saved)
+    try:
+        results, summary = dispatcher.dispatch(posts())
+    finally:
+        transport.close()
+        if pool is not None:
+            pool.close()
+        app.shutdown_scheduler()
+    summary['invalid'] = counts['invalid']
+    print(json.dumps(summary, indent=2))
+    return 0 if summary['failed'] == 0 and not counts['invalid'] else 2
+
+
+def serve(args):
+    server = MockServer(args.host, args.port, args.latency, failure_rate=args.failure_rate, seed=args.seed)
+    server.start()
+    print(f"Mock posting endpoint listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    print(f"Accepted {len(server.posts)} posts.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Post concurrently over a pluggable transport.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    dispatching = argparse.ArgumentParser(add_help=False)
+    dispatching.add_argument('--concurrency', type=int, default=10, help="posts in flight at once")
+    dispatching.add_argument('--rate', type=float, help="at most this many posts started per second")
+    dispatching.add_argument('--burst', type=int, default=1, help="posts that may start at once under --rate")
+    dispatching.add_argument('--retries', type=int, default=0, help="retries per post after the first attempt")
+    dispatching.add_argument('--backoff', type=float, default=2.0, help="base of the exponential retry backoff in seconds")
+    dispatching.add_argument('--url', help="HTTP endpoint to post to")
+
+    simulated = argparse.ArgumentParser(add_help=False)
+    simulated.add_argument('--latency', type=float, default=0.05, help="simulated seconds per post")
+    simulated.add_argument('--failure-rate', type=float, default=0.0, help="fraction of posts the mock rejects")
+    simulated.add_argument('--seed', type=int)
+
+    bench = commands.add_parser('bench', parents=[dispatching, simulated], help="measure posting throughput offline")
+    bench.add_argument('--posts', type=int, default=1000)
+    bench.add_argument('--transport', choices=('http', 'mock'), default='http',
+                       help="http posts to a local mock server (or --url); mock skips the network")
+    bench.add_argument('--report', help="append per-post results to this JSON Lines file")
+
+    post = commands.add_parser('queue', parents=[dispatching], help="post a batch.py queue file")
+    post.add_argument('queue', help="JSON Lines file of post specs")
+    post.add_argument('--transport', choices=('selenium', 'http'), default='selenium')
+    post.add_argument('--results', default='dispatch_results.jsonl', help="where to append per-post results")
+
+    server = commands.add_parser('serve', parents=[simulated], help="run the mock posting endpoint")
+    server.add_argument('--host', default='127.0.0.1')
+    server.add_argument('--port', type=int, default=8765)
+
+    args = parser.parse_args(argv)
+    if args.command == 'bench':
+        return run_bench(args)
+    if args.command == 'queue':
+        return post_queue(args)
+    return serve(args)
+
+
+if __name__ == "__main__":
+    sys.exit(metrics.profiled(main))
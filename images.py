@@ -0,0 +1,312 @@
+"""Picture ingest pipeline.
+
+Pictures are content-hashed so the same image is never stored twice, their
+metadata (dimensions, size, hash) is kept in pictures/index.jsonl, and an
+upload-optimized copy plus a thumbnail are generated ahead of time in
+pictures/.variants. Hashing and resizing run in a process pool.
+
+Resizing needs Pillow. Without it pictures are still hashed, deduplicated
+and indexed (dimensions are read from the PNG/JPEG header), but no variants
+are made and the original is uploaded.
+
+Usage:
+    python images.py ingest <file> [<file> ...] [--workers N] [--keep]
+    python images.py sync        # index pictures already in the directory
+"""
+
+import os
+import sys
+import struct
+import shutil
+import hashlib
+import tempfile
+import argparse
+import threading
+from datetime import datetime
+
+from jsonl_store import JsonlStore
+
+EXTENSIONS = ('.png', '.jpg', '.jpeg')
+UPLOAD_MAX_SIDE = 2048
+UPLOAD_QUALITY = 85
+THUMB_MAX_SIDE = 320
+THUMB_QUALITY = 75
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def header_size(path):
+    """Read (width, height) from a PNG or JPEG header without decoding the image."""
+    with open(path, 'rb') as file:
+        head = file.read(26)
+        if head[:8] == b'\x89PNG\r\n\x1a\n':
+            return struct.unpack('>II', head[16:24])
+        if head[:2] != b'\xff\xd8':
+            return None
+        file.seek(2)
+        while True:
+            marker = file.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            if marker[1] in (0xD8, 0x01) or 0xD0 <= marker[1] <= 0xD7:
+                continue
+            length = struct.unpack('>H', file.read(2))[0]
+            # SOF0-SOF15 carry the frame size; C4, C8 and CC are not frames.
+            if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>xHH', file.read(5))
+                return width, height
+            file.seek(length - 2, os.SEEK_CUR)
+
+
+_pillow_module = False
+
+
+def pillow():
+    """Return PIL.Image, or None without Pillow. Imported on first use to keep startup fast."""
+    global _pillow_module
+    if _pillow_module is False:
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = None
+        _pillow_module = Image
+    return _pillow_module
+
+
+def _save_variant(image, path, max_side, quality):
+    variant = image.copy()
+    variant.thumbnail((max_side, max_side))
+    if variant.mode not in ('RGB', 'L'):
+        background = pillow().new('RGB', variant.size, (255, 255, 255))
+        background.paste(variant, mask=variant.convert('RGBA').split()[-1])
+        variant = background
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.jpg')
+    os.close(fd)
+    try:
+        variant.save(temp_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def process_picture(path, variants_dir):
+    """Hash a picture, read its metadata and build its variants.
+
+    Runs in a worker process. Variants are named by content hash, so a
+    picture that was already processed is not resized again.
+    """
+    digest = file_hash(path)
+    record = {
+        'hash': digest,
+        'bytes': os.path.getsize(path),
+        'width': None,
+        'height': None,
+        'variants': {},
+    }
+    Image = pillow()
+    if Image is None:
+        size = header_size(path)
+        if size:
+            record['width'], record['height'] = size
+        return record
+
+    os.makedirs(variants_dir, exist_ok=True)
+    upload_path = os.path.join(variants_dir, f"{digest}-upload.jpg")
+    thumb_path = os.path.join(variants_dir, f"{digest}-thumb.jpg")
+    with Image.open(path) as image:
+        record['width'], record['height'] = image.size
+        if not os.path.exists(upload_path):
+            _save_variant(image, upload_path, UPLOAD_MAX_SIDE, UPLOAD_QUALITY)
+        if not os.path.exists(thumb_path):
+            _save_variant(image, thumb_path, THUMB_MAX_SIDE, THUMB_QUALITY)
+    # Keep the original for upload if recompressing did not make it smaller.
+    if os.path.getsize(upload_path) < record['bytes']:
+        record['variants']['upload'] = os.path.basename(upload_path)
+    record['variants']['thumb'] = os.path.basename(thumb_path)
+    return record
+
+
+def copy_into(source, directory, name):
+    """Copy source into directory as name via a temp file and rename.
+
+    Works across filesystems, unlike os.rename. Returns False instead of
+    overwriting an existing file.
+    """
+    destination = os.path.join(directory, name)
+    if os.path.exists(destination):
+        return False
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.ingest-')
+    os.close(fd)
+    try:
+        shutil.copy2(source, temp_path)
+        try:
+            os.link(temp_path, destination)  # fails if the name was taken meanwhile
+        except FileExistsError:
+            return False
+        except OSError:
+            # Filesystem without hard links: fall back to a plain rename.
+            if os.path.exists(destination):
+                return False
+            os.replace(temp_path, destination)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return True
+
+
+class PictureIndex:
+    """Metadata for every ingested picture, keyed by content hash and by file name.
+
+    upload_path() is called from several posting threads at once, so the
+    maps are built in locals and published together under a lock, and
+    changed only under it.
+    """
+
+    def __init__(self, pictures_dir):
+        self.pictures_dir = pictures_dir
+        self.variants_dir = os.path.join(pictures_dir, '.variants')
+        self.store = JsonlStore(os.path.join(pictures_dir, 'index.jsonl'))
+        self._maps = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Return (by_hash, by_name), reading the index on first use."""
+        maps = self._maps
+        if maps is None:
+            with self._lock:
+                if self._maps is None:
+                    by_hash, by_name = {}, {}
+                    for record in self.store:
+                        by_hash[record['hash']] = record
+                        by_name[record['name']] = record
+                    self._maps = by_hash, by_name
+                maps = self._maps
+        return maps
+
+    def __len__(self):
+        return len(self._load()[0])
+
+    def by_hash(self, digest):
+        return self._load()[0].get(digest)
+
+    def by_name(self, name):
+        return self._load()[1].get(name)
+
+    def names(self):
+        by_name = self._load()[1]
+        with self._lock:
+            return list(by_name)
+
+    def upload_path(self, name):
+        """Path of the upload-optimized variant of name, or of the original."""
+        record = self.by_name(name)
+        if record and record['variants'].get('upload'):
+            path = os.path.join(self.variants_dir, record['variants']['upload'])
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.pictures_dir, name)
+
+    def _add(self, record):
+        by_hash, by_name = self._load()
+        with self._lock:
+            self.store.append(record)
+            by_hash[record['hash']] = record
+            by_name[record['name']] = record
+
+    def ingest(self, paths, workers=None, move=False):
+        """Ingest picture files, skipping content that is already indexed.
+
+        Returns a list of (path, status, name) tuples where status is 'added',
+        'duplicate', 'invalid' or 'error: ...'.
+        """
+        os.makedirs(self.pictures_dir, exist_ok=True)
+        results = []
+        valid = []
+        for path in paths:
+            if not os.path.isfile(path) or not path.lower().endswith(EXTENSIONS):
+                results.append((path, 'invalid', None))
+            else:
+                valid.append(path)
+        if not valid:
+            return results
+
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [(path, executor.submit(process_picture, path, self.variants_dir)) for path in valid]
+            for path, future in futures:
+                try:
+                    record = future.result()
+                except Exception as e:
+                    results.append((path, f"error: {e}", None))
+                    continue
+                existing = self.by_hash(record['hash'])
+                if existing is not None:
+                    results.append((path, 'duplicate', existing['name']))
+                    continue
+                try:
+                    results.append((path, 'added', self._store_file(path, record, move)))
+                except OSError as e:
+                    results.append((path, f"error: {e}", None))
+        return results
+
+    def _store_file(self, path, record, move):
+        in_place = os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.pictures_dir)
+        name = os.path.basename(path)
+        if not in_place:
+            if not copy_into(path, self.pictures_dir, name):
+                stem, extension = os.path.splitext(name)
+                name = f"{stem}-{record['hash'][:8]}{extension}"
+                if not copy_into(path, self.pictures_dir, name):
+                    raise FileExistsError(f"{name} already exists in {self.pictures_dir}")
+            if move:
+                os.remove(path)
+        record['name'] = name
+        record['added_at'] = datetime.now().isoformat(timespec='seconds')
+        self._add(record)
+        return name
+
+    def sync(self, workers=None):
+        """Index pictures that were dropped into the directory by hand."""
+        known = set(self.names())
+        pending = [
+            os.path.join(self.pictures_dir, name)
+            for name in sorted(os.listdir(self.pictures_dir))
+            if name.lower().endswith(EXTENSIONS) and name not in known
+        ]
+        return self.ingest(pending, workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest pictures into TwinkleTones/pictures.")
+    parser.add_argument('--pictures-dir', default=os.path.join('TwinkleTones', 'pictures'))
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="add picture files")
+    ingest.add_argument('paths', nargs='+')
+    ingest.add_argument('--keep', action='store_true', help="leave the source files in place")
+    commands.add_parser('sync', help="index pictures already in the directory")
+    args = parser.parse_args(argv)
+
+    if pillow() is None:
+        print("Pillow is not installed; pictures will be indexed without resized variants.")
+    index = PictureIndex(args.pictures_dir)
+    if args.command == 'ingest':
+        results = index.ingest(args.paths, args.workers, move=not args.keep)
+    else:
+        results = index.sync(args.workers)
+    for path, status, name in results:
+        print(f"{status}: {path}" + (f" -> {name}" if name else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
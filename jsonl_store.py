@@ -0,0 +1,131 @@
+import os
+import json
+import tempfile
+
+from locking import file_lock
+
+
+def atomic_write_lines(path, lines):
+    """Write lines to path through a temp file in the same directory and rename it into place."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".jsonl")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            for line in lines:
+                file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class JsonlStore:
+    """Append-only JSON Lines file with compaction on demand.
+
+    Appends write a single line to the end of the file, so their cost does not
+    depend on how large the file already is. A crash can at worst leave a torn
+    last line; readers skip it and the next compaction drops it. compact()
+    rewrites the file through a temp file and rename, optionally dropping
+    records (deals use it to purge expired ones). Appends, compaction and
+    migration from several processes are ordered by an advisory lock on a
+    sidecar .lock file.
+
+    If the JSON Lines file does not exist yet but legacy_path does, the legacy
+    JSON array (or the list under legacy_key) is converted on first access.
+    A legacy file that fails to convert is retried on every access, and
+    appends are refused until it converts, so they never create a JSON
+    Lines file that would hide the legacy records.
+    """
+
+    def __init__(self, path, legacy_path=None, legacy_key=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.legacy_key = legacy_key
+        self._migrated = False
+
+    def migrate_legacy(self):
+        """Convert the legacy JSON file once, if there is one and no JSON Lines file yet."""
+        if self._migrated:
+            return
+        if os.path.exists(self.path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            self._migrated = True
+            return
+        with file_lock(self.path):
+            if not os.path.exists(self.path):  # otherwise another process converted it first
+                with open(self.legacy_path, "r", encoding="utf-8") as file:
+                    data = json.load(file)
+                if self.legacy_key:
+                    data = data.get(self.legacy_key, [])
+                atomic_write_lines(self.path, (json.dumps(record, ensure_ascii=False) + "\n" for record in data))
+        # Only now: a failed conversion must be retried, not skipped.
+        self._migrated = True
+
+    def __iter__(self):
+        """Stream records one at a time, skipping torn or malformed lines."""
+        self.migrate_legacy()
+        try:
+            file = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with file:
+            for line in file:
+                if not line.endswith("\n"):
+                    break  # torn write at the end of the file
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def append(self, record):
+        """Append one record to the end of the file."""
+        self.extend([record])
+
+    def extend(self, records, chunk_size=1000):
+        """Append records under a single lock, writing them in chunks. Returns the count written."""
+        self.migrate_legacy()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        written = 0
+        # The lock orders appends from several processes and keeps them off
+        # a file that compaction is about to replace.
+        with file_lock(self.path):
+            if self.legacy_path and not os.path.exists(self.path) and os.path.exists(self.legacy_path):
+                raise OSError(f"{self.legacy_path} has not been converted to {self.path} yet")
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.fstat(fd).st_size
+                # A leading newline terminates a torn line so the new records stay readable.
+                prefix = b"\n" if size and os.pread(fd, 1, size - 1) != b"\n" else b""
+                chunk = []
+                for record in records:
+                    chunk.append(json.dumps(record, ensure_ascii=False) + "\n")
+                    if len(chunk) >= chunk_size:
+                        os.write(fd, prefix + "".join(chunk).encode("utf-8"))
+                        written += len(chunk)
+                        prefix, chunk = b"", []
+                if chunk:
+                    os.write(fd, prefix + "".join(chunk).encode("utf-8"))
+                    written += len(chunk)
+            finally:
+                os.close(fd)
+        return written
+
+    def compact(self, keep=None):
+        """Rewrite the file without torn lines.
+
+        If keep is given, records for which keep(record) is false are dropped too.
+        """
+        self.migrate_legacy()
+        with file_lock(self.path):
+            if not os.path.exists(self.path):
+                return
+            records = self
+            if keep is not None:
+                records = (record for record in records if keep(record))
+            # Stream into the temp file; the source stays intact until the rename.
+            atomic_write_lines(self.path, (json.dumps(record, ensure_ascii=False) + "\n" for record in records))
@@ -0,0 +1,29 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, fall back to unlocked access
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Hold an advisory fcntl lock on path + '.lock' for the duration of the block.
+
+    Exclusive by default; shared=True lets readers overlap with each other
+    but not with writers. A separate lock file is used so the data file
+    itself can be replaced by rename while the lock is held.
+    """
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # closing the descriptor releases the lock
@@ -0,0 +1,167 @@
+"""Lightweight timings and counters for the CLI.
+
+Instrumentation is off unless TT_METRICS is set when the program starts:
+
+    TT_METRICS=metrics.prom python app.py   # Prometheus text format
+    TT_METRICS=metrics.json python app.py   # JSON summary
+    TT_METRICS=1 python app.py              # same as metrics.prom
+
+The file is written when the program exits. With instrumentation off,
+timed() returns the function unchanged and timer()/count() return
+immediately, so the hooks cost next to nothing.
+
+TT_PROFILE=run.prof wraps the whole run (see profiled()) in cProfile and
+writes the stats there; inspect them with `python -m pstats run.prof`.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+METRICS_PATH = os.environ.get("TT_METRICS", "")
+if METRICS_PATH.lower() in ("1", "true", "yes"):
+    METRICS_PATH = "metrics.prom"
+ENABLED = bool(METRICS_PATH) and METRICS_PATH.lower() not in ("0", "false", "no")
+PROFILE_PATH = os.environ.get("TT_PROFILE")
+
+_DISABLED = nullcontext()
+
+
+class Registry:
+    """Thread-safe timer and counter totals."""
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, failed=False):
+        with self._lock:
+            stats = self.timers.get(name)
+            if stats is None:
+                stats = self.timers[name] = {"count": 0, "errors": 0, "sum": 0.0, "max": 0.0}
+            stats["count"] += 1
+            stats["errors"] += failed
+            stats["sum"] += seconds
+            if seconds > stats["max"]:
+                stats["max"] = seconds
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        with self._lock:
+            timers = {
+                name: dict(stats, sum=round(stats["sum"], 6), max=round(stats["max"], 6),
+                           mean=round(stats["sum"] / stats["count"], 6))
+                for name, stats in sorted(self.timers.items())
+            }
+            return {"timers": timers, "counters": dict(sorted(self.counters.items()))}
+
+    def prometheus_text(self):
+        summary = self.summary()
+        lines = [
+            "# HELP tt_operation_seconds Time spent in instrumented operations.",
+            "# TYPE tt_operation_seconds summary",
+        ]
+        for name, stats in summary["timers"].items():
+            lines.append(f'tt_operation_seconds_sum{{op="{name}"}} {stats["sum"]}')
+            lines.append(f'tt_operation_seconds_count{{op="{name}"}} {stats["count"]}')
+        lines += ["# HELP tt_operation_seconds_max Slowest call of each operation.",
+                  "# TYPE tt_operation_seconds_max gauge"]
+        lines += [f'tt_operation_seconds_max{{op="{name}"}} {stats["max"]}' for name, stats in summary["timers"].items()]
+        lines += ["# HELP tt_operation_errors_total Calls that raised an exception.",
+                  "# TYPE tt_operation_errors_total counter"]
+        lines += [f'tt_operation_errors_total{{op="{name}"}} {stats["errors"]}' for name, stats in summary["timers"].items()]
+        lines += ["# HELP tt_events_total Counted events.", "# TYPE tt_events_total counter"]
+        lines += [f'tt_events_total{{event="{name}"}} {value}' for name, value in summary["counters"].items()]
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """Write the totals to path, as JSON if it ends in .json and Prometheus text otherwise."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as file:
+            if path.endswith(".json"):
+                json.dump(self.summary(), file, indent=2)
+            else:
+                file.write(self.prometheus_text())
+
+
+registry = Registry()
+
+
+@contextmanager
+def _timing(name):
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        registry.observe(name, time.perf_counter() - start, failed)
+
+
+def timer(name):
+    """Context manager recording how long its block takes under name."""
+    return _timing(name) if ENABLED else _DISABLED
+
+
+def timed(name):
+    """Decorator recording each call's duration under name."""
+    def decorate(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timing(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, amount=1):
+    """Add amount to the counter name."""
+    if ENABLED:
+        registry.increment(name, amount)
+
+
+def profiled(func, *args, **kwargs):
+    """Call func, under cProfile if TT_PROFILE is set, and return its result."""
+    if not PROFILE_PATH:
+        return func(*args, **kwargs)
+    import cProfile
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        profiler.dump_stats(PROFILE_PATH)
+        print(f"Profile written to {PROFILE_PATH} (view it with: python -m pstats {PROFILE_PATH})", file=sys.stderr)
+
+
+def percentile(sorted_values, fraction):
+    """The value at fraction (0..1) of an already sorted, non-empty list (nearest rank)."""
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _dump_on_exit():
+    try:
+        registry.dump(METRICS_PATH)
+    except OSError as e:
+        print(f"Could not write metrics to {METRICS_PATH}: {e}", file=sys.stderr)
+
+
+if ENABLED:
+    atexit.register(_dump_on_exit)
@@ -32,6 +32,19 @@ Features:
    - The function is designed to be easily integrated into any Python script, making it a convenient tool 
      for automating dependency management in various project environments.
 
+6. Installs Only What Is Missing:
+   - Requirements are parsed properly (names, extras, version specifiers, environment markers) and compared
+     against the installed distributions, so only missing or out-of-date packages are installed and an
+     interrupted installation picks up where it stopped.
+   - Libraries to omit are matched by exact package name.
+   - pip's output is streamed into the log as it happens, with the time each package took.
+
+7. Offline Wheelhouse Mode:
+   - With a wheelhouse directory, wheels for the missing packages (and their dependencies) are built or
+     downloaded into it in parallel, skipping packages that already have a wheel there.
+   - Packages are then installed from the wheelhouse only ('--no-index'), so a filled wheelhouse installs
+     offline and fast. Pass offline=True (or --offline) to never touch the package index at all.
+
 Why use this script in production?
 -----------------------------------
 1. Automated Dependency Management:
@@ -64,6 +77,13 @@ Example:
     from pipin import install_requirements
     install_requirements()
 
+    # Fill a local wheelhouse once, then install from it (also works offline later on):
+    install_requirements(wheelhouse='wheelhouse')
+    install_requirements(wheelhouse='wheelhouse', offline=True)
+
+From the command line:
+    python pipen.py --wheelhouse wheelhouse [--offline] [--workers 4] [--omit Pillow] [--prefetch-only]
+
     # Continue with the rest of your script here...
 
 Log File Example:
@@ -88,95 +108,344 @@ By using this script, you ensure that all required dependencies for your project
 """
 
 #------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
-import subprocess
 import os
+import re
+import sys
+import json
+import time
+import hashlib
+import importlib
+import threading
 from datetime import datetime
 import shutil
 
-def install_requirements(omit_libraries=None, disable_installation=False):
+REQUIREMENTS_CACHE = '.requirements_ok'
+LOG_FILE = 'install_log.txt'
+
+
+def _packaging():
+    """Return packaging's requirements/utils modules, falling back to the copy vendored in pip."""
+    try:
+        from packaging import requirements, utils
+    except ImportError:
+        from pip._vendor.packaging import requirements, utils
+    return requirements, utils
+
+
+def canonical_name(name):
+    """PEP 503 normalized package name: 'Webdriver_Manager' -> 'webdriver-manager'."""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def parse_requirements(requirements_file='requirements.txt'):
+    """Parse a requirements file into packaging Requirement objects.
+
+    Handles comments, blank lines, line continuations and nested '-r' files.
+    Requirements whose environment marker does not apply to this interpreter
+    are dropped. Other pip options ('--index-url', ...) are ignored.
     """
-    Installs Python packages listed in 'requirements.txt', with additional options:
+    requirements, _ = _packaging()
+    with open(requirements_file) as req_file:
+        text = req_file.read().replace('\\\n', '')
+    parsed = []
+    for line in text.splitlines():
+        line = re.sub(r'(^|\s)#.*$', '', line).strip()
+        if not line:
+            continue
+        if line.startswith(('-r ', '--requirement ')):
+            nested = line.split(None, 1)[1].strip()
+            parsed.extend(parse_requirements(os.path.join(os.path.dirname(requirements_file), nested)))
+            continue
+        if line.startswith('-'):
+            continue
+        try:
+            requirement = requirements.Requirement(line)
+        except requirements.InvalidRequirement as e:
+            raise ValueError(f"Invalid requirement in {requirements_file}: {line!r} ({e})") from None
+        if requirement.marker is None or requirement.marker.evaluate():
+            parsed.append(requirement)
+    return parsed
+
+
+def installed_version(name):
+    from importlib import metadata
+
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def missing_packages(requirements):
+    """Return the requirements that are not installed at a version their specifier allows."""
+    missing = []
+    for requirement in requirements:
+        version = installed_version(requirement.name)
+        if version is None or not requirement.specifier.contains(version, prereleases=True):
+            missing.append(requirement)
+    return missing
+
+
+def wheel_for(requirement, wheelhouse):
+    """Return the path of a wheel in wheelhouse satisfying requirement, or None."""
+    _, utils = _packaging()
+    name = canonical_name(requirement.name)
+    try:
+        filenames = os.listdir(wheelhouse)
+    except FileNotFoundError:
+        return None
+    for filename in filenames:
+        if not filename.endswith('.whl'):
+            continue
+        try:
+            wheel_name, version, _, _ = utils.parse_wheel_filename(filename)
+        except utils.InvalidWheelFilename:
+            continue
+        if wheel_name == name and requirement.specifier.contains(version, prereleases=True):
+            return os.path.join(wheelhouse, filename)
+    return None
+
+
+class _Log:
+    """Appends lines to the install log as they arrive, from any thread."""
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def write(self, line):
+        with self._lock:
+            self.file.write(line.rstrip('\n') + '\n')
+            self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def _run_pip(args, log, label):
+    """Run pip, streaming its output into the log. Returns (returncode, seconds)."""
+    import subprocess
+
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'pip'] + args, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True)
+    for line in process.stdout:
+        log.write(f"[{label}] {line}")
+    return process.wait(), time.perf_counter() - start
+
+
+def prefetch_wheels(requirements, wheelhouse, log, workers=4, offline=False):
+    """Build or download wheels for requirements (and their dependencies) into wheelhouse.
+
+    Runs one 'pip wheel' per requirement on up to workers threads. Requirements
+    that already have a matching wheel are skipped, so an interrupted prefetch
+    resumes where it stopped. Returns the requirements that could not be fetched.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    os.makedirs(wheelhouse, exist_ok=True)
+    todo = []
+    for requirement in requirements:
+        if wheel_for(requirement, wheelhouse):
+            log.write(f"[{requirement.name}] wheel already in {wheelhouse}")
+        else:
+            todo.append(requirement)
+
+    def fetch(requirement):
+        args = ['wheel', '--wheel-dir', wheelhouse, '--find-links', wheelhouse, str(requirement)]
+        if offline:
+            args.insert(1, '--no-index')
+        returncode, seconds = _run_pip(args, log, requirement.name)
+        log.write(f"[{requirement.name}] {'fetched' if returncode == 0 else 'FAILED to fetch'} in {seconds:.1f}s")
+        return returncode == 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        fetched = list(executor.map(fetch, todo))
+    return [requirement for requirement, ok in zip(todo, fetched) if not ok]
+
+
+def install_requirements(omit_libraries=None, disable_installation=False, requirements_file='requirements.txt',
+                         wheelhouse=None, offline=False, workers=4, prefetch_only=False, log_file=LOG_FILE):
+    """
+    Installs the packages from 'requirements.txt' that are missing or out of date, with additional options:
     
-    - Omits specified libraries if needed.
+    - Omits specified libraries (matched by exact package name) if needed.
     - Handles cases where 'pip' is not installed.
     - Optionally disable installation via a function argument.
+    - Optionally prefetch wheels into, and install from, a local wheelhouse directory.
     
     Args:
         omit_libraries (list, optional): A list of libraries to omit from installation.
         disable_installation (bool, optional): If set to True, skips the installation process.
-    """
-    log_file = 'install_log.txt'
+        requirements_file (str, optional): The requirements file to read.
+        wheelhouse (str, optional): Directory of wheels to fill in parallel and install from with '--no-index'.
+        offline (bool, optional): Never contact the package index; only use wheels already in the wheelhouse.
+        workers (int, optional): Number of parallel wheel downloads/builds.
+        prefetch_only (bool, optional): Fill the wheelhouse without installing anything.
 
+    Returns:
+        bool: True if every requirement is now installed (or, with prefetch_only, fetched).
+    """
     # If disable_installation is set to True, skip the entire installation process
     if disable_installation:
         with open(log_file, 'a') as log:
             log.write(f"===== Installation disabled by user at {datetime.now()} =====\n")
         print("Installation is disabled. Skipping the installation process.")
-        return
+        return False
 
     # Check if pip is installed
-    if shutil.which('pip') is None:
+    from importlib.util import find_spec
+    if find_spec('pip') is None and shutil.which('pip') is None:
         with open(log_file, 'a') as log:
             log.write(f"===== Critical Error: 'pip' is missing! at {datetime.now()} =====\n")
         print("Error: 'pip' is not installed. Please install 'pip' to proceed.")
-        return
-    
-    # Read the requirements.txt file
+        return False
+
+    # Read the requirements file
     try:
-        with open('requirements.txt', 'r') as req_file:
-            requirements = req_file.readlines()
+        requirements = parse_requirements(requirements_file)
     except FileNotFoundError:
         with open(log_file, 'a') as log:
-            log.write(f"===== Critical Error: 'requirements.txt' not found at {datetime.now()} =====\n")
-        print("Error: 'requirements.txt' not found. Ensure the file exists in the project directory.")
-        return
-    
+            log.write(f"===== Critical Error: '{requirements_file}' not found at {datetime.now()} =====\n")
+        print(f"Error: '{requirements_file}' not found. Ensure the file exists in the project directory.")
+        return False
+    except ValueError as e:
+        with open(log_file, 'a') as log:
+            log.write(f"===== Critical Error: {e} =====\n")
+        print(f"Error: {e}")
+        return False
+
     # Filter out any libraries the user wants to omit
     if omit_libraries:
-        requirements = [req for req in requirements if not any(omit in req for omit in omit_libraries)]
+        omitted = {canonical_name(name) for name in omit_libraries}
+        requirements = [req for req in requirements if canonical_name(req.name) not in omitted]
 
-    with open(log_file, 'a') as log:
-        log.write(f"\n\n===== Installation started at {datetime.now()} =====\n")
+    if offline and not wheelhouse:
+        print("Offline installation needs a wheelhouse directory.")
+        return False
 
+    log = _Log(log_file)
+    log.write(f"\n\n===== Installation started at {datetime.now()} =====")
     try:
-        # Install the filtered list of requirements
-        if requirements:
-            # Create a temporary requirements file excluding omitted libraries
-            temp_req_file = 'temp_requirements.txt'
-            with open(temp_req_file, 'w') as temp_file:
-                temp_file.writelines(requirements)
-
-            # Install packages from the temporary requirements file
-            result = subprocess.run(['pip', 'install', '-r', temp_req_file], capture_output=True, text=True)
-            
-            # Log success messages
-            with open(log_file, 'a') as log:
-                log.write("===== Successful Installation =====\n")
-                log.write(result.stdout)
-            
-            # Check for errors
-            if result.returncode != 0:
-                with open(log_file, 'a') as log:
-                    log.write("===== Installation Errors =====\n")
-                    log.write(result.stderr)
-                print("Failed to install some packages. Check 'install_log.txt' for details.")
-            else:
-                print("All packages installed successfully.")
-            
-            # Clean up the temporary requirements file
-            os.remove(temp_req_file)
+        # Only install what is not already there; a rerun after a failure resumes here.
+        todo = requirements if prefetch_only else missing_packages(requirements)
+        for requirement in requirements:
+            if requirement not in todo:
+                log.write(f"[{requirement.name}] already installed ({installed_version(requirement.name)})")
+        if not todo:
+            print("All requirements are already installed." if requirements else
+                  "No packages to install. All requested libraries were omitted.")
+            return True
+
+        failed = []
+        if wheelhouse:
+            log.write(f"===== Prefetching {len(todo)} package(s) into {wheelhouse} =====")
+            failed = prefetch_wheels(todo, wheelhouse, log, workers, offline)
+            todo = [req for req in todo if req not in failed]
+
+        installed = []
+        if not prefetch_only:
+            # Installs run one at a time: concurrent pip runs can clobber each other's files.
+            for requirement in todo:
+                importlib.invalidate_caches()
+                if not missing_packages([requirement]):
+                    log.write(f"[{requirement.name}] already installed as a dependency")
+                    installed.append(requirement)
+                    continue
+                args = ['install', str(requirement)]
+                if wheelhouse:
+                    args[1:1] = ['--no-index', '--find-links', wheelhouse]
+                returncode, seconds = _run_pip(args, log, requirement.name)
+                log.write(f"[{requirement.name}] {'installed' if returncode == 0 else 'FAILED'} in {seconds:.1f}s")
+                (installed if returncode == 0 else failed).append(requirement)
+                print(f"{'Installed' if returncode == 0 else 'Failed to install'} {requirement} ({seconds:.1f}s)")
+
+        log.write("===== Successful Installation =====")
+        for requirement in (todo if prefetch_only else installed):
+            log.write(str(requirement))
+        if failed:
+            log.write("===== Installation Errors =====")
+            for requirement in failed:
+                log.write(str(requirement))
+            print(f"Failed to install some packages. Check '{log_file}' for details.")
+        elif prefetch_only:
+            print(f"All wheels are in {wheelhouse}.")
         else:
-            print("No packages to install. All requested libraries were omitted.")
+            print("All packages installed successfully.")
+        return not failed
+    finally:
+        # Finalizing log
+        log.write(f"===== Installation ended at {datetime.now()} =====")
+        log.close()
 
-    except subprocess.CalledProcessError as e:
-        # Log critical errors (if subprocess itself fails)
-        with open(log_file, 'a') as log:
-            log.write(f"===== Critical Error: {e} =====\n")
-        print(f"Installation failed. Error: {e}")
-    
-    # Finalizing log
-    with open(log_file, 'a') as log:
-        log.write(f"===== Installation ended at {datetime.now()} =====\n")
+
+def requirements_key(requirements_file='requirements.txt'):
+    """Hash of the requirements file and the interpreter, or None if the file is missing."""
+    try:
+        with open(requirements_file, 'rb') as req_file:
+            content = req_file.read()
+    except FileNotFoundError:
+        return None
+    return hashlib.sha256(content + sys.executable.encode() + sys.version.encode()).hexdigest()
+
+
+def missing_requirements(requirements_file='requirements.txt'):
+    """Return the requirements (as strings) that are not installed at an allowed version.
+
+    Uses importlib.metadata only, so checking takes milliseconds and never
+    starts pip.
+    """
+    return [str(requirement) for requirement in missing_packages(parse_requirements(requirements_file))]
+
+
+def ensure_requirements(requirements_file='requirements.txt', cache_file=REQUIREMENTS_CACHE):
+    """Make sure requirements are installed, running pip only when something is missing.
+
+    A satisfied check is remembered in cache_file under a hash of the
+    requirements file and interpreter, so later starts with the same
+    requirements skip even the metadata lookups. Set TT_WHEELHOUSE to
+    install from (and fill) a local wheelhouse.
+    """
+    key = requirements_key(requirements_file)
+    if key is None:
+        return install_requirements(requirements_file=requirements_file)  # reports the missing file
+    try:
+        with open(cache_file) as cache:
+            if json.load(cache).get('key') == key:
+                return
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    missing = missing_requirements(requirements_file)
+    if missing:
+        print(f"Installing missing requirements: {', '.join(missing)}")
+        install_requirements(requirements_file=requirements_file, wheelhouse=os.environ.get('TT_WHEELHOUSE'))
+        missing = missing_requirements(requirements_file)
+    if not missing:
+        with open(cache_file, 'w') as cache:
+            json.dump({'key': key, 'checked_at': datetime.now().isoformat(timespec='seconds')}, cache)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Install missing requirements, optionally through a local wheelhouse.")
+    parser.add_argument('-r', '--requirements', default='requirements.txt')
+    parser.add_argument('--wheelhouse', help="directory to fill with wheels and install from")
+    parser.add_argument('--offline', action='store_true', help="only use wheels already in the wheelhouse")
+    parser.add_argument('--workers', type=int, default=4, help="parallel wheel downloads/builds")
+    parser.add_argument('--omit', nargs='+', default=None, help="package names to skip")
+    parser.add_argument('--prefetch-only', action='store_true', help="fill the wheelhouse without installing")
+    parser.add_argument('--log', default=LOG_FILE)
+    args = parser.parse_args(argv)
+    ok = install_requirements(args.omit, requirements_file=args.requirements, wheelhouse=args.wheelhouse,
+                              offline=args.offline, workers=args.workers, prefetch_only=args.prefetch_only,
+                              log_file=args.log)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
 
 
 #------------------------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -0,0 +1,53 @@
+import math
+
+from content_pools import item_id
+
+PAGE_SIZE = 10
+
+HELP = "Enter an ID to select, 'n'/'p' for next/previous page, 'g <page>' to jump, '/ <words>' to filter, '/' to clear"
+
+
+def browse_pool(pool, title, describe=str, page_size=PAGE_SIZE, allow_skip=False, prompt=input):
+    """Page through a content pool and return the item the user picks.
+
+    Only one page is printed at a time. Items are shown and selected by their
+    stable ID, so selections stay correct when the pool grows. Keyword
+    filters use the pool's index instead of rescanning every item. With
+    allow_skip, an empty answer returns None.
+    """
+    query = None
+    page = 0
+    while True:
+        items = pool.search(query) if query else pool.items
+        pages = max(1, math.ceil(len(items) / page_size))
+        page = min(max(page, 0), pages - 1)
+
+        heading = f"\n{title} (page {page + 1}/{pages}, {len(items)} items"
+        heading += f" matching '{query}')" if query else ")"
+        print(heading)
+        for item in items[page * page_size:(page + 1) * page_size]:
+            print(f"  [{item_id(item)}] {describe(item)}")
+        print(HELP + (", or press Enter to skip." if allow_skip else "."))
+
+        answer = prompt(f"{title}: ").strip()
+        if not answer:
+            if allow_skip:
+                return None
+            continue
+        if answer == "n":
+            page += 1
+        elif answer == "p":
+            page -= 1
+        elif answer.startswith("g "):
+            try:
+                page = int(answer[2:]) - 1
+            except ValueError:
+                print("Page must be a number.")
+        elif answer.startswith("/"):
+            query = answer[1:].strip() or None
+            page = 0
+        else:
+            item = pool.get(answer)
+            if item is not None:
+                return item
+            print(f"No {title.lower()} with ID {answer}.")
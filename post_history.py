@@ -0,0 +1,460 @@
+"""Post history in SQLite.
+
+Every published post is one row, indexed by time, picture, deal product
+and a 64-bit hash of its content, so questions like "posts in the last 7
+days", "how often was this picture used" or "was this exact text already
+posted" are index lookups. Results and exports are read in pages, so
+memory does not grow with the size of the history.
+
+apply_retention() folds posts older than a cutoff into per-day counts
+(per picture and deal product) plus a compact fingerprint of what was
+posted, then deletes them: usage counts and duplicate checks keep working
+while the table stays bounded.
+
+Usage:
+    python post_history.py stats [--days 7]
+    python post_history.py export posts.jsonl [--days 30]   # .csv works too
+    python post_history.py prune --keep-days 90
+    python post_history.py migrate TwinkleTones/saved_posts.jsonl [--report rejects.jsonl]
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+from datetime import datetime
+
+from jsonl_store import JsonlStore
+
+PAGE_SIZE = 500
+DB_FILE = 'post_history.db'
+
+
+def content_hash(content):
+    """Signed 64-bit hash of the post text (fits an SQLite INTEGER)."""
+    digest = hashlib.blake2b(str(content).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def parse_post_time(value):
+    """Unix timestamp for a saved post's 'YYYY-MM-DD HH:MM[:SS]' time, or None."""
+    for time_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(str(value), time_format).timestamp()
+        except ValueError:
+            continue
+    return None
+
+
+class PostHistoryStore:
+    """Published posts in SQLite, safe to share between threads."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS posts ("
+                    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                    " posted_at REAL NOT NULL,"
+                    " scheduled_time TEXT,"
+                    " content TEXT NOT NULL,"
+                    " content_hash INTEGER NOT NULL,"
+                    " picture TEXT,"
+                    " deal_product TEXT,"
+                    " deal TEXT,"
+                    " selection TEXT"
+                    ")"
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS posts_by_time ON posts (posted_at)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS posts_by_picture ON posts (picture, posted_at)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS posts_by_deal ON posts (deal_product, posted_at)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS posts_by_hash ON posts (content_hash)")
+                # What apply_retention() keeps of pruned posts.
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS daily_rollup ("
+                    " day TEXT NOT NULL,"
+                    " picture TEXT NOT NULL DEFAULT '',"
+                    " deal_product TEXT NOT NULL DEFAULT '',"
+                    " posts INTEGER NOT NULL,"
+                    " PRIMARY KEY (day, picture, deal_product)"
+                    ") WITHOUT ROWID"
+                )
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS fingerprints ("
+                    " content_hash INTEGER NOT NULL,"
+                    " picture TEXT NOT NULL DEFAULT '',"
+                    " PRIMARY KEY (content_hash, picture)"
+                    ") WITHOUT ROWID"
+                )
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _row(self, post, posted_at=None):
+        deal = post.get('deal')
+        if posted_at is None:
+            posted_at = post.get('posted_at') or parse_post_time(post.get('scheduled_time')) or time.time()
+        return (
+            posted_at,
+            post.get('scheduled_time'),
+            post.get('content', ''),
+            content_hash(post.get('content', '')),
+            post.get('picture'),
+            deal.get('product') if isinstance(deal, dict) else None,
+            json.dumps(deal, ensure_ascii=False) if deal else None,
+            json.dumps(post.get('selection'), ensure_ascii=False) if post.get('selection') else None,
+        )
+
+    def add(self, content, deal, picture, scheduled_time, selection=None, posted_at=None):
+        """Record a published post. Returns its id."""
+        post = {'content': content, 'deal': deal, 'picture': picture, 'scheduled_time': scheduled_time,
+                'selection': selection}
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO posts (posted_at, scheduled_time, content, content_hash, picture, deal_product,"
+                " deal, selection) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                self._row(post, time.time() if posted_at is None else posted_at),
+            )
+        return cursor.lastrowid
+
+    def add_many(self, posts, batch_size=5000):
+        """Insert post dicts (as saved_posts.jsonl holds them) in batches. Returns the count.
+
+        A post's time is its posted_at, else its scheduled_time, else now.
+        """
+        added = 0
+        batch = []
+        for post in posts:
+            batch.append(self._row(post))
+            if len(batch) >= batch_size:
+                added += self._insert(batch)
+                batch = []
+        if batch:
+            added += self._insert(batch)
+        return added
+
+    def _insert(self, rows):
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO posts (posted_at, scheduled_time, content, content_hash, picture, deal_product,"
+                " deal, selection) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def _post(self, row):
+        post_id, posted_at, scheduled_time, content, picture, deal, selection = row
+        return {
+            'id': post_id,
+            'posted_at': posted_at,
+            'scheduled_time': scheduled_time,
+            'content': content,
+            'picture': picture,
+            'deal': json.loads(deal) if deal else None,
+            'selection': json.loads(selection) if selection else None,
+        }
+
+    def _pages(self, where="", params=()):
+        """Stream matching posts oldest first, PAGE_SIZE rows per indexed query."""
+        last = (float('-inf'), 0)
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT id, posted_at, scheduled_time, content, picture, deal, selection FROM posts"
+                    f" WHERE (posted_at, id) > (?, ?) {where} ORDER BY posted_at, id LIMIT {PAGE_SIZE}",
+                    last + tuple(params),
+                ).fetchall()
+            for row in rows:
+                yield self._post(row)
+            if len(rows) < PAGE_SIZE:
+                return
+            last = (rows[-1][1], rows[-1][0])
+
+    def __iter__(self):
+        return self._pages()
+
+    def posts_between(self, start=None, end=None):
+        """Stream posts with start <= posted_at < end (either may be None)."""
+        where, params = [], []
+        if start is not None:
+            where.append("AND posted_at >= ?")
+            params.append(start)
+        if end is not None:
+            where.append("AND posted_at < ?")
+            params.append(end)
+        return self._pages(" ".join(where), params)
+
+    def posts_in_last(self, days, now=None):
+        return self.posts_between(start=(time.time() if now is None else now) - days * 86400)
+
+    def count_between(self, start=None, end=None):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM posts WHERE posted_at >= ? AND posted_at < ?",
+                (float('-inf') if start is None else start, float('inf') if end is None else end),
+            ).fetchone()[0]
+
+    def recent(self, n):
+        """The newest n posts, oldest first."""
+        if n <= 0:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, posted_at, scheduled_time, content, picture, deal, selection FROM posts"
+                " ORDER BY posted_at DESC, id DESC LIMIT ?",
+                (n,),
+            ).fetchall()
+        return [self._post(row) for row in reversed(rows)]
+
+    def picture_usage(self, picture):
+        """How many times picture was posted, including pruned posts."""
+        with self._lock:
+            live = self.conn.execute("SELECT COUNT(*) FROM posts WHERE picture = ?", (picture,)).fetchone()[0]
+            rolled = self.conn.execute(
+                "SELECT COALESCE(SUM(posts), 0) FROM daily_rollup WHERE picture = ?", (picture,)
+            ).fetchone()[0]
+        return live + rolled
+
+    def deal_usage(self, product):
+        """How many posts promoted the deal for product, including pruned posts."""
+        with self._lock:
+            live = self.conn.execute("SELECT COUNT(*) FROM posts WHERE deal_product = ?", (product,)).fetchone()[0]
+            rolled = self.conn.execute(
+                "SELECT COALESCE(SUM(posts), 0) FROM daily_rollup WHERE deal_product = ?", (product,)
+            ).fetchone()[0]
+        return live + rolled
+
+    def top_pictures(self, limit=10, start=None):
+        """(picture, posts) pairs for the most used pictures since start (all time by default)."""
+        with self._lock:
+            if start is not None:
+                return self.conn.execute(
+                    "SELECT picture, COUNT(*) AS n FROM posts WHERE posted_at >= ? AND picture IS NOT NULL"
+                    " GROUP BY picture ORDER BY n DESC, picture LIMIT ?",
+                    (start, limit),
+                ).fetchall()
+            return self.conn.execute(
+                "SELECT picture, SUM(n) AS total FROM ("
+                " SELECT picture, COUNT(*) AS n FROM posts WHERE picture IS NOT NULL GROUP BY picture"
+                " UNION ALL SELECT picture, SUM(posts) FROM daily_rollup WHERE picture != '' GROUP BY picture"
+                ") GROUP BY picture ORDER BY total DESC, picture LIMIT ?",
+                (limit,),
+            ).fetchall()
+
+    def was_posted(self, content):
+        """Whether this exact text was ever posted (with any picture)."""
+        key = content_hash(content)
+        with self._lock:
+            for row in self.conn.execute("SELECT content FROM posts WHERE content_hash = ?", (key,)):
+                if row[0] == content:
+                    return True
+            return self.conn.execute(
+                "SELECT 1 FROM fingerprints WHERE content_hash = ? LIMIT 1", (key,)
+            ).fetchone() is not None
+
+    def has_post(self, content, picture):
+        """Whether this exact text was ever posted with this picture."""
+        key = content_hash(content)
+        with self._lock:
+            for row in self.conn.execute(
+                "SELECT content FROM posts WHERE content_hash = ? AND picture IS ?", (key, picture)
+            ):
+                if row[0] == content:
+                    return True
+            return self.conn.execute(
+                "SELECT 1 FROM fingerprints WHERE content_hash = ? AND picture = ?", (key, picture or '')
+            ).fetchone() is not None
+
+    def apply_retention(self, keep_days, now=None):
+        """Roll posts older than keep_days into daily counts and fingerprints, then delete them.
+
+        Returns the number of posts pruned.
+        """
+        cutoff = (time.time() if now is None else now) - keep_days * 86400
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO daily_rollup (day, picture, deal_product, posts)"
+                " SELECT date(posted_at, 'unixepoch', 'localtime'), COALESCE(picture, ''),"
+                " COALESCE(deal_product, ''), COUNT(*) FROM posts WHERE posted_at < ?"
+                " GROUP BY 1, 2, 3"
+                " ON CONFLICT (day, picture, deal_product) DO UPDATE SET posts = posts + excluded.posts",
+                (cutoff,),
+            )
+            self.conn.execute(
+                "INSERT OR IGNORE INTO fingerprints (content_hash, picture)"
+                " SELECT content_hash, COALESCE(picture, '') FROM posts WHERE posted_at < ?",
+                (cutoff,),
+            )
+            pruned = self.conn.execute("DELETE FROM posts WHERE posted_at < ?", (cutoff,)).rowcount
+        return pruned
+
+    def daily_counts(self, start=None):
+        """(day, posts) pairs, oldest first, combining live posts and rollups."""
+        live_where = rolled_where = ""
+        params = ()
+        if start is not None:
+            live_where = "WHERE posted_at >= ?"
+            rolled_where = "WHERE day >= date(?, 'unixepoch', 'localtime')"
+            params = (start, start)
+        with self._lock:
+            return self.conn.execute(
+                "SELECT day, SUM(n) FROM ("
+                " SELECT date(posted_at, 'unixepoch', 'localtime') AS day, COUNT(*) AS n FROM posts"
+                f" {live_where} GROUP BY day"
+                f" UNION ALL SELECT day, SUM(posts) FROM daily_rollup {rolled_where} GROUP BY day"
+                ") GROUP BY day ORDER BY day",
+                params,
+            ).fetchall()
+
+    def export(self, path, start=None, end=None):
+        """Stream posts to a .csv or JSON Lines file. Returns the number written."""
+        posts = self.posts_between(start, end)
+        written = 0
+        with open(path, "w", newline="", encoding="utf-8") as file:
+            if path.lower().endswith(".csv"):
+                fields = ['id', 'posted_at', 'scheduled_time', 'content', 'picture', 'deal', 'selection']
+                writer = csv.DictWriter(file, fieldnames=fields)
+                writer.writeheader()
+                for post in posts:
+                    post['deal'] = json.dumps(post['deal'], ensure_ascii=False) if post['deal'] else ''
+                    post['selection'] = json.dumps(post['selection']) if post['selection'] else ''
+                    writer.writerow(post)
+                    written += 1
+            else:
+                for post in posts:
+                    file.write(json.dumps(post, ensure_ascii=False) + "\n")
+                    written += 1
+        return written
+
+
+def migrate_posts(source, db_path, report_path):
+    """Import saved post records (any iterable) into the history at db_path.
+
+    Records that are not objects are skipped and written to report_path
+    with their position. A new database is built under a temporary name and
+    renamed into place only once complete, so an interrupted import leaves
+    no partial history behind and is retried next time. Into an existing
+    database the posts are simply added. Returns (migrated, rejected).
+    """
+    if os.path.exists(report_path):
+        os.remove(report_path)
+    rejects = []
+
+    def valid():
+        for number, post in enumerate(source, start=1):
+            if isinstance(post, dict):
+                yield post
+            else:
+                rejects.append({"record": number, "error": "record is not an object", "row": post})
+
+    def finish(migrated):
+        if rejects:
+            JsonlStore(report_path).extend(rejects)
+        return migrated, len(rejects)
+
+    if os.path.exists(db_path):
+        store = PostHistoryStore(db_path)
+        try:
+            return finish(store.add_many(valid()))
+        finally:
+            store.close()
+
+    directory = os.path.dirname(db_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".db")
+    os.close(fd)
+    store = PostHistoryStore(temp_path)
+    try:
+        store.conn  # create the schema even if there is nothing to import
+        migrated = store.add_many(valid())
+        store.close()  # checkpoints the WAL into the database file
+        os.replace(temp_path, db_path)
+    except BaseException:
+        store.close()
+        for path in (temp_path, temp_path + "-wal", temp_path + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return finish(migrated)
+
+
+def open_history(base_dir='TwinkleTones'):
+    """Open base_dir's post history, importing saved_posts.jsonl (or .json) the first time."""
+    db_path = os.path.join(base_dir, DB_FILE)
+    if not os.path.exists(db_path):
+        legacy = JsonlStore(os.path.join(base_dir, 'saved_posts.jsonl'),
+                            legacy_path=os.path.join(base_dir, 'saved_posts.json'))
+        if os.path.exists(legacy.path) or os.path.exists(legacy.legacy_path):
+            report_path = os.path.join(base_dir, 'saved_posts.rejects.jsonl')
+            migrated, rejected = migrate_posts(legacy, db_path, report_path)
+            print(f"Imported {migrated} saved posts into {db_path}")
+            if rejected:
+                print(f"Skipped {rejected} invalid saved posts; see {report_path}")
+    return PostHistoryStore(db_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query, export and prune the post history.")
+    parser.add_argument('--dir', default='TwinkleTones', help="TwinkleTones data directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    stats = commands.add_parser('stats', help="post counts and most used pictures")
+    stats.add_argument('--days', type=float, default=7)
+    export = commands.add_parser('export', help="write posts to a .jsonl or .csv file")
+    export.add_argument('path')
+    export.add_argument('--days', type=float, help="only the last N days")
+    prune = commands.add_parser('prune', help="roll up and delete old posts")
+    prune.add_argument('--keep-days', type=float, required=True)
+    migrate = commands.add_parser('migrate', help="import a saved_posts.jsonl file")
+    migrate.add_argument('path')
+    migrate.add_argument('--report', help="where to write skipped records (default: <path>.rejects.jsonl)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'migrate':
+        report_path = args.report or f"{os.path.splitext(args.path)[0]}.rejects.jsonl"
+        migrated, rejected = migrate_posts(JsonlStore(args.path), os.path.join(args.dir, DB_FILE), report_path)
+        print(f"Imported {migrated} posts from {args.path}, skipped {rejected}.")
+        return 0
+    store = open_history(args.dir)
+    try:
+        if args.command == 'stats':
+            since = time.time() - args.days * 86400
+            print(f"Posts: {len(store)} kept, {store.count_between(since)} in the last {args.days:g} days")
+            for picture, posts in store.top_pictures(5):
+                print(f"  {picture}: {posts}")
+        elif args.command == 'export':
+            start = time.time() - args.days * 86400 if args.days else None
+            print(f"Exported {store.export(args.path, start)} posts to {args.path}")
+        elif args.command == 'prune':
+            print(f"Pruned {store.apply_retention(args.keep_days)} posts older than {args.keep_days:g} days")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
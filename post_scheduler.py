@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PostJobStore:
+    """Durable queue of scheduled posts in SQLite.
+
+    Jobs are only read in due-time order and in small batches, so the number
+    of queued posts does not affect memory use.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                    " due_at REAL NOT NULL,"
+                    " payload TEXT NOT NULL,"
+                    " status TEXT NOT NULL DEFAULT 'pending',"
+                    " attempts INTEGER NOT NULL DEFAULT 0,"
+                    " last_error TEXT,"
+                    " updated_at REAL"
+                    ")"
+                )
+                self._conn.execute(
+                    "CREATE INDEX IF NOT EXISTS jobs_by_status_due ON jobs (status, due_at)"
+                )
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def add(self, payload, due_at):
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO jobs (due_at, payload, updated_at) VALUES (?, ?, ?)",
+                (due_at, json.dumps(payload), time.time()),
+            )
+        return cursor.lastrowid
+
+    def claim_due(self, now, limit):
+        """Mark up to limit due jobs as running and return them, oldest first."""
+        if limit <= 0:
+            return []
+        with self._lock, self.conn:
+            rows = self.conn.execute(
+                "SELECT id, due_at, payload, attempts FROM jobs"
+                " WHERE status = 'pending' AND due_at <= ? ORDER BY due_at, id LIMIT ?",
+                (now, limit),
+            ).fetchall()
+            # Only keep the jobs this call actually moved out of 'pending', in
+            # case another process is dispatching from the same store.
+            rows = [
+                row for row in rows
+                if self.conn.execute(
+                    "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ? AND status = 'pending'",
+                    (now, row[0]),
+                ).rowcount
+            ]
+        return [
+            {'id': job_id, 'due_at': due_at, 'payload': json.loads(payload), 'attempts': attempts}
+            for job_id, due_at, payload, attempts in rows
+        ]
+
+    def finish(self, job_id, status, now, error=None):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, error, now, job_id),
+            )
+
+    def mark(self, job_id, status, now, error=None):
+        """Set a job's final status without counting it as an attempt."""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, error, now, job_id),
+            )
+
+    def coalesce(self, job, now):
+        """Mark other due jobs with the same payload as coalesced into job."""
+        with self._lock, self.conn:
+            cursor = self.conn.execute(
+                "UPDATE jobs SET status = 'coalesced', updated_at = ?"
+                " WHERE status = 'pending' AND due_at <= ? AND payload = ? AND id != ?",
+                (now, now, json.dumps(job['payload']), job['id']),
+            )
+        return cursor.rowcount
+
+    def retry(self, job_id, due_at, now, error):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status = 'pending', due_at = ?, attempts = attempts + 1,"
+                " last_error = ?, updated_at = ? WHERE id = ?",
+                (due_at, error, now, job_id),
+            )
+
+    def requeue_running(self):
+        """Put jobs left running by a crashed process back in the queue."""
+        with self._lock, self.conn:
+            cursor = self.conn.execute("UPDATE jobs SET status = 'pending' WHERE status = 'running'")
+        return cursor.rowcount
+
+    def count(self, status='pending'):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def pending_payloads(self):
+        """Stream the payloads of jobs that have not been posted yet."""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT id, payload FROM jobs WHERE status IN ('pending', 'running') AND id > ?"
+                    " ORDER BY id LIMIT 500",
+                    (last_id,),
+                ).fetchall()
+            if not rows:
+                return
+            for last_id, payload in rows:
+                yield json.loads(payload)
+
+    def next_due(self):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MIN(due_at) FROM jobs WHERE status = 'pending'"
+            ).fetchone()
+        return row[0]
+
+
+class PostScheduler:
+    """Dispatches due posts from a PostJobStore to a bounded thread pool.
+
+    tick() claims at most as many jobs as there are free workers, so the
+    queue itself never has to be loaded. Jobs more than misfire_grace_time
+    seconds late are marked 'missed' instead of posted (None means always
+    post). With coalesce=True, due jobs carrying identical payloads are
+    posted once and the duplicates marked 'coalesced'. Failed
+    posts are retried after retry_delay seconds up to max_attempts times.
+
+    ready, if given, is asked before claiming jobs: while it returns false
+    (e.g. no credentials to post with yet) due jobs stay pending instead of
+    being claimed and failing.
+
+    clock and poster are injectable, so the scheduler can be driven with a
+    fake clock and a stub poster by calling tick() directly.
+    """
+
+    def __init__(self, store, poster, clock=time.time, max_workers=2, misfire_grace_time=3600,
+                 coalesce=True, max_attempts=3, retry_delay=60, ready=None):
+        self.store = store
+        self.poster = poster
+        self.ready = ready
+        self.clock = clock
+        self.max_workers = max_workers
+        self.misfire_grace_time = misfire_grace_time
+        self.coalesce = coalesce
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._executor = None
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="post")
+        return self._executor
+
+    def schedule(self, payload, due_at):
+        """Queue payload to be posted at due_at (a Unix timestamp). Returns the job id."""
+        return self.store.add(payload, due_at)
+
+    def start(self, scheduler, interval=5):
+        """Poll for due jobs every interval seconds on an APScheduler scheduler."""
+        self.store.requeue_running()
+        scheduler.add_job(
+            self.tick, 'interval', seconds=interval, id='post-dispatcher',
+            replace_existing=True, max_instances=1, coalesce=True,
+        )
+
+    def tick(self):
+        """Dispatch due jobs to free workers. Returns the number dispatched."""
+        if self.ready is not None and not self.ready():
+            return 0
+        now = self.clock()
+        with self._lock:
+            free = self.max_workers - len(self._in_flight)
+        dispatched = 0
+        for job in self.store.claim_due(now, free):
+            if self.misfire_grace_time is not None and now - job['due_at'] > self.misfire_grace_time:
+                self.store.mark(job['id'], 'missed', now)
+                continue
+            if self.coalesce:
+                self.store.coalesce(job, now)
+            future = self.executor.submit(self._run, job)
+            with self._lock:
+                self._in_flight.add(future)
+            future.add_done_callback(self._done)
+            dispatched += 1
+        return dispatched
+
+    def _done(self, future):
+        with self._lock:
+            self._in_flight.discard(future)
+
+    def _run(self, job):
+        try:
+            self.poster(job['payload'])
+        except Exception as e:
+            now = self.clock()
+            error = f"{e.__class__.__name__}: {e}"
+            if job['attempts'] + 1 < self.max_attempts:
+                self.store.retry(job['id'], now + self.retry_delay, now, error)
+            else:
+                self.store.finish(job['id'], 'failed', now, error)
+            print(f"Scheduled post {job['id']} failed: {error}")
+            return
+        self.store.finish(job['id'], 'done', self.clock())
+
+    def drain(self):
+        """Wait for every dispatched post to finish."""
+        with self._lock:
+            pending = list(self._in_flight)
+        for future in pending:
+            future.result()
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+        self.store.close()
@@ -0,0 +1,86 @@
+"""Multi-process stress check for catalog and content-pool writes.
+
+Spawns writer processes that concurrently
+  - increment a shared counter entry in the catalog with update() (CAS retries),
+  - edit their own catalog entries with expected_version,
+  - append records to one shared JSON Lines content pool,
+then verifies that no update or append was lost.
+
+Usage:
+    python stress.py [--writers 8] [--ops 200] [--dir stress_data]
+"""
+
+import os
+import sys
+import shutil
+import argparse
+import multiprocessing
+
+from catalog_store import CatalogStore, VersionConflict
+from jsonl_store import JsonlStore
+
+
+def _writer(directory, writer_id, ops):
+    store = CatalogStore(os.path.join(directory, "catalog.db"))
+    pool = JsonlStore(os.path.join(directory, "pool.jsonl"))
+    code = f"W{writer_id}"
+    conflicts = 0
+    for op in range(ops):
+        # Shared hot entry: update() retries until its read-modify-write wins.
+        while True:
+            try:
+                entry, version = store.get_versioned("counter")
+                store.update("counter", {"count": entry["count"] + 1}, expected_version=version)
+                break
+            except VersionConflict:
+                conflicts += 1
+        store.update(code, {"edits": op + 1})
+        pool.append({"writer": writer_id, "op": op})
+    store.close()
+    return conflicts
+
+
+def run(directory, writers, ops):
+    """Run the stress check. Returns a list of problems (empty on success)."""
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    store = CatalogStore(os.path.join(directory, "catalog.db"))
+    store.put({"product_code": "counter", "ring_name": "counter", "count": 0})
+    store.put_many({"product_code": f"W{i}", "ring_name": f"writer {i}", "edits": 0} for i in range(writers))
+
+    with multiprocessing.Pool(writers) as workers:
+        conflicts = sum(workers.starmap(_writer, [(directory, i, ops) for i in range(writers)]))
+
+    problems = []
+    expected = writers * ops
+    count = store.get("counter")["count"]
+    if count != expected:
+        problems.append(f"counter is {count}, expected {expected}")
+    for i in range(writers):
+        edits = store.get(f"W{i}")["edits"]
+        if edits != ops:
+            problems.append(f"W{i} has {edits} edits, expected {ops}")
+    records = list(JsonlStore(os.path.join(directory, "pool.jsonl")))
+    if len(records) != expected or len({(r["writer"], r["op"]) for r in records}) != expected:
+        problems.append(f"pool has {len(records)} records, expected {expected} distinct")
+    print(f"{writers} writers x {ops} ops: {conflicts} version conflicts retried")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent writer stress check.")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--dir", default="stress_data")
+    args = parser.parse_args(argv)
+    problems = run(args.dir, args.writers, args.ops)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK: no lost updates")
+        shutil.rmtree(args.dir, ignore_errors=True)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+"""Post templating.
+
+Templates use {field} placeholders, dotted lookups such as {deal.price},
+and sections {#name}...{/name} that render only when name is truthy.
+Write {{ and }} for literal braces. Each template is parsed once into a
+tree of small render functions and cached, so rendering thousands of
+variants only pays for string joins.
+"""
+
+import re
+import json
+from functools import lru_cache
+
+PLATFORM_LIMITS = {
+    'facebook': 63206,
+    'instagram': 2200,
+    'twitter': 280,
+}
+
+DEFAULT_TEMPLATES = {
+    'selection': "{quote} {text} {symbol}",
+    'post': (
+        "{content}"
+        "{#deal}"
+        "\n📢 Deal Alert! 📢\n\n"
+        "Get our {deal.product} now for just {deal.price}! 🔥 That's {deal.discount} off the original price.\n\n"
+        "👉 Buy Now: {deal.link}\n"
+        "\n{deal_hashtags}"
+        "{/deal}"
+    ),
+}
+
+DEAL_HASHTAGS = ('Discount', 'BuyNow')
+
+_TOKEN_RE = re.compile(r"\{\{|\}\}|\{#([\w.]+)\}|\{/([\w.]+)\}|\{([\w.]+)\}")
+_HASHTAG_STRIP_RE = re.compile(r"[^\w]+")
+
+
+class TemplateError(ValueError):
+    """Raised for malformed templates or fields missing from the context."""
+
+
+def normalize_hashtag(text, legacy=False):
+    """Turn arbitrary text into a hashtag: 'Gold Ring (18k)' -> '#GoldRing18k'.
+
+    legacy=True gives the original form, which only removes spaces:
+    'Gold Ring (18k)' -> '#GoldRing(18k)'.
+    """
+    if legacy:
+        return "#" + str(text).replace(" ", "")
+    tag = _HASHTAG_STRIP_RE.sub("", str(text).lstrip("#"))
+    return f"#{tag}" if tag else ""
+
+
+def format_hashtags(tags, legacy=False):
+    """Normalize tags and join them, dropping empties and case-insensitive duplicates.
+
+    legacy=True joins the original forms as they are, without deduplicating.
+    """
+    if legacy:
+        return " ".join(normalize_hashtag(tag, legacy=True) for tag in tags)
+    seen = set()
+    result = []
+    for tag in tags:
+        tag = normalize_hashtag(tag)
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            result.append(tag)
+    return " ".join(result)
+
+
+def _lookup(path):
+    keys = path.split(".")
+
+    def lookup(context):
+        value = context
+        for key in keys:
+            try:
+                value = value[key]
+            except (KeyError, TypeError, IndexError):
+                raise TemplateError(f"missing field '{path}'") from None
+        return value
+
+    return lookup
+
+
+def _field(path):
+    lookup = _lookup(path)
+    return lambda context: str(lookup(context))
+
+
+def _section(path, body):
+    keys = path.split(".")
+
+    def section(context):
+        value = context
+        for key in keys:
+            value = value.get(key) if isinstance(value, dict) else None
+        if not value:
+            return ""
+        return "".join(part(context) for part in body)
+
+    return section
+
+
+@lru_cache(maxsize=256)
+def compile_template(text):
+    """Parse template text once into a render(context) -> str function."""
+    stack = [(None, [])]
+    position = 0
+    for match in _TOKEN_RE.finditer(text):
+        parts = stack[-1][1]
+        if match.start() > position:
+            literal = text[position:match.start()]
+            parts.append(lambda context, literal=literal: literal)
+        token, opening, closing, field = match.group(0), match.group(1), match.group(2), match.group(3)
+        if token in ("{{", "}}"):
+            parts.append(lambda context, brace=token[0]: brace)
+        elif opening:
+            stack.append((opening, []))
+        elif closing:
+            name, body = stack.pop()
+            if name != closing:
+                raise TemplateError(f"{{/{closing}}} closes {{#{name}}}" if name else f"unexpected {{/{closing}}}")
+            stack[-1][1].append(_section(name, body))
+        else:
+            parts.append(_field(field))
+        position = match.end()
+    if len(stack) > 1:
+        raise TemplateError(f"unclosed section {{#{stack[-1][0]}}}")
+    parts = stack[0][1]
+    if position < len(text):
+        literal = text[position:]
+        parts.append(lambda context: literal)
+
+    def render(context):
+        return "".join(part(context) for part in parts)
+
+    return render
+
+
+def fit_to_limit(render, context, limit, field='content'):
+    """Render, shortening context[field] with an ellipsis if the result exceeds limit.
+
+    The rest of the post (deal block, link, hashtags) is kept intact; only if
+    that alone is too long is the output cut hard at limit.
+    """
+    text = render(context)
+    if limit is None or len(text) <= limit:
+        return text
+    value = str(context.get(field, ""))
+    keep = len(value) - (len(text) - limit) - 1
+    if keep > 0:
+        text = render(dict(context, **{field: value[:keep].rstrip() + "…"}))
+    return text[:limit]
+
+
+class TemplateRegistry:
+    """Named templates, seeded with the built-in ones and optionally loaded from a JSON file."""
+
+    def __init__(self, templates=None):
+        self.templates = dict(DEFAULT_TEMPLATES)
+        if templates:
+            self.templates.update(templates)
+
+    def register(self, name, text):
+        compile_template(text)  # fail fast on syntax errors
+        self.templates[name] = text
+
+    def load_file(self, path):
+        """Add templates from a JSON object of name -> template text, if the file exists."""
+        try:
+            with open(path, encoding="utf-8") as file:
+                templates = json.load(file)
+        except FileNotFoundError:
+            return
+        for name, text in templates.items():
+            self.register(name, text)
+
+    def renderer(self, name):
+        try:
+            return compile_template(self.templates[name])
+        except KeyError:
+            raise TemplateError(f"unknown template '{name}'") from None
+
+    def render(self, name, context, platform='facebook'):
+        return fit_to_limit(self.renderer(name), context, PLATFORM_LIMITS.get(platform))
+
+    def render_many(self, name, contexts, platform='facebook'):
+        """Render a batch of contexts with one compiled template."""
+        render = self.renderer(name)
+        limit = PLATFORM_LIMITS.get(platform)
+        for context in contexts:
+            yield fit_to_limit(render, context, limit)
+
+
+def post_context(content, deal=None):
+    """Build the context for the 'post' template, including the deal hashtags.
+
+    hashtags are normalized and deduplicated. deal_hashtags, used by the
+    built-in 'post' template, keep the original form (spaces removed from the
+    product name, nothing else) so existing posts render unchanged.
+    """
+    context = {'content': content, 'deal': deal}
+    if deal:
+        context['hashtags'] = format_hashtags(DEAL_HASHTAGS + (deal['product'],))
+        context['deal_hashtags'] = format_hashtags(DEAL_HASHTAGS + (deal['product'],), legacy=True)
+    return context
@@ -0,0 +1,74 @@
+import re
+from bisect import bisect_left
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into case-folded word tokens."""
+    return _TOKEN_RE.findall(str(text).casefold())
+
+
+def term_counts(text):
+    """Return a dict of token frequencies for text."""
+    counts = {}
+    for token in tokenize(text):
+        counts[token] = counts.get(token, 0) + 1
+    return counts
+
+
+def prefix_bounds(prefix):
+    """Return the [low, high) range of terms starting with prefix."""
+    return prefix, prefix + "\U0010ffff"
+
+
+class InvertedIndex:
+    """In-memory token index mapping terms to the ids of the documents containing them.
+
+    Documents are added incrementally; prefix queries use a sorted term list
+    that is only rebuilt after new terms have been added.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self._sorted_terms = None
+
+    def add(self, doc_id, text):
+        for term in set(tokenize(text)):
+            docs = self.postings.get(term)
+            if docs is None:
+                docs = self.postings[term] = set()
+                self._sorted_terms = None
+            docs.add(doc_id)
+
+    def _matching(self, token, prefix):
+        if not prefix:
+            return self.postings.get(token, set())
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        low, high = prefix_bounds(token)
+        start = bisect_left(self._sorted_terms, low)
+        end = bisect_left(self._sorted_terms, high, start)
+        docs = set()
+        for term in self._sorted_terms[start:end]:
+            docs |= self.postings[term]
+        return docs
+
+    def search(self, query, match="all", prefix=True):
+        """Return the sorted ids of documents matching all (or any) query tokens.
+
+        With prefix=True the last token also matches longer terms.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        result = None
+        for position, token in enumerate(tokens):
+            docs = self._matching(token, prefix and position == len(tokens) - 1)
+            if result is None:
+                result = set(docs)
+            elif match == "all":
+                result &= docs
+            else:
+                result |= docs
+        return sorted(result)
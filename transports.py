@@ -0,0 +1,245 @@
+"""Ways of delivering a post, for the async dispatcher in dispatch.py.
+
+A transport has an async send(post) that returns once the post is
+delivered (raising on failure) and a close(). A post is a dict like the
+scheduler's payloads: content, picture, deal, scheduled_time and
+optionally selection and id.
+
+  - SeleniumTransport posts through the browser session pool, running the
+    blocking Selenium calls on a thread pool.
+  - HttpTransport POSTs the post as JSON to an HTTP endpoint over a pool of
+    keep-alive connections.
+  - MockTransport only waits a simulated latency, for dispatcher tests.
+  - MockServer is a local HTTP endpoint for HttpTransport to post to, so
+    posting can be tested and load-tested offline.
+"""
+
+import json
+import time
+import queue
+import random
+import asyncio
+import threading
+import http.client
+from datetime import datetime
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class PostFailed(Exception):
+    """The target rejected a post."""
+
+
+class _ThreadedTransport:
+    """Runs a blocking _send(post) on a thread pool so send() can be awaited."""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    async def send(self, post):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._send, post)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class SeleniumTransport(_ThreadedTransport):
+    """Posts through app.deliver() on a warm SessionPool, one thread per browser session.
+
+    Saving the post is left to the caller (see dispatch.post_queue).
+    """
+
+    def __init__(self, app, pool):
+        super().__init__(pool.size)
+        self.app = app
+        self.pool = pool
+
+    def _send(self, post):
+        post_time = post.get('scheduled_time') or datetime.now().strftime(TIME_FORMAT)
+        return self.app.deliver(self.pool, post['content'], post['picture'], post_time, job_id=post.get('id'))
+
+
+class HttpTransport(_ThreadedTransport):
+    """POSTs each post as JSON to url, reusing up to size keep-alive connections.
+
+    Any status of 400 or more raises PostFailed. A request that fails on a
+    reused connection (the server may have closed it while idle) is retried
+    once on a new one. The picture is sent by name only.
+    """
+
+    def __init__(self, url, size=10, timeout=30, headers=None):
+        super().__init__(size)
+        parts = urlsplit(url)
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.host = parts.netloc
+        self.path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        self.timeout = timeout
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.connections_opened = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        with self._lock:
+            self.connections_opened += 1
+        return self.connection_class(self.host, timeout=self.timeout)
+
+    def _request(self, connection, body):
+        connection.request('POST', self.path, body, self.headers)
+        response = connection.getresponse()
+        return response, response.read()
+
+    def _send(self, post):
+        body = json.dumps({key: post.get(key) for key in ('id', 'content', 'picture', 'deal', 'scheduled_time')},
+                          ensure_ascii=False).encode('utf-8')
+        try:
+            connection, reused = self._idle.get_nowait(), True
+        except queue.Empty:
+            connection, reused = self._connect(), False
+        try:
+            try:
+                response, data = self._request(connection, body)
+            except (http.client.HTTPException, ConnectionError):
+                if not reused:
+                    raise
+                connection.close()
+                connection = self._connect()
+                response, data = self._request(connection, body)
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._idle.put(connection)
+        if response.status >= 400:
+            raise PostFailed(f"HTTP {response.status}: {data[:200].decode('utf-8', 'replace')}")
+        return data
+
+    def close(self):
+        super().close()
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class MockTransport:
+    """Pretends to post: waits latency seconds (+/- jitter) and fails at failure_rate."""
+
+    def __init__(self, latency=0.05, jitter=0.5, failure_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.sent = 0
+        self._random = random.Random(seed)
+
+    async def send(self, post):
+        await asyncio.sleep(self.latency * (1 + self.jitter * (2 * self._random.random() - 1)))
+        if self._random.random() < self.failure_rate:
+            raise PostFailed("simulated failure")
+        self.sent += 1
+
+    def close(self):
+        pass
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep connections alive between requests
+    # Headers and body are separate small writes; with Nagle on, the body waits
+    # for the client's delayed ACK (~40 ms) on every keep-alive request.
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        with server.lock:
+            failed = server.random.random() < server.failure_rate
+            delay = server.latency * (1 + server.jitter * (2 * server.random.random() - 1))
+        time.sleep(delay)
+        try:
+            post = json.loads(body)
+            content = post['content']
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {'error': 'expected a JSON post with content'})
+            return
+        if failed:
+            self._reply(503, {'error': 'simulated failure'})
+            return
+        with server.lock:
+            server.posts.append(content)
+            number = len(server.posts)
+        self._reply(201, {'id': number})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog for load runs with many connections
+
+
+class MockServer:
+    """A local HTTP endpoint that accepts posts after a simulated latency.
+
+    Every POST with a JSON body containing content gets 201 (or 503 at
+    failure_rate); accepted post contents are kept in posts. Port 0 picks
+    a free port; url is set once started.
+
+        with MockServer(latency=0.05) as server:
+            transport = HttpTransport(server.url)
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.05, jitter=0.5, failure_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.url = None
+        self._server = None
+        self._thread = None
+
+    @property
+    def posts(self):
+        return self._server.posts if self._server else []
+
+    def start(self):
+        server = _MockHTTPServer((self.host, self.port), _MockHandler)
+        server.lock = threading.Lock()
+        server.random = random.Random(self.seed)
+        server.latency, server.jitter, server.failure_rate = self.latency, self.jitter, self.failure_rate
+        server.posts = []
+        self._server = server
+        self.url = f"http://{self.host}:{server.server_address[1]}/posts"
+        self._thread = threading.Thread(target=server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
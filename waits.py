@@ -0,0 +1,106 @@
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from jsonl_store import JsonlStore
+
+DEFAULT_TIMEOUT = float(os.environ.get('TT_WAIT_TIMEOUT', '20'))
+POLL_INTERVAL = 0.1
+
+
+def wait_for(driver, condition, timeout=None, message=""):
+    """Block until condition(driver) is truthy and return its value.
+
+    Raises selenium's TimeoutException after timeout seconds
+    (TT_WAIT_TIMEOUT, 20 by default).
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    timeout = DEFAULT_TIMEOUT if timeout is None else timeout
+    return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(condition, message)
+
+
+def element_present(driver, locator, timeout=None):
+    from selenium.webdriver.support import expected_conditions as EC
+    return wait_for(driver, EC.presence_of_element_located(locator), timeout, f"{locator} never appeared")
+
+
+def element_clickable(driver, locator, timeout=None):
+    from selenium.webdriver.support import expected_conditions as EC
+    return wait_for(driver, EC.element_to_be_clickable(locator), timeout, f"{locator} never became clickable")
+
+
+def element_gone(driver, locator, timeout=None):
+    from selenium.webdriver.support import expected_conditions as EC
+    return wait_for(driver, EC.invisibility_of_element_located(locator), timeout, f"{locator} never went away")
+
+
+def url_changes(driver, old_url, timeout=None):
+    from selenium.webdriver.support import expected_conditions as EC
+    return wait_for(driver, EC.url_changes(old_url), timeout, f"URL never changed from {old_url}")
+
+
+def document_ready(driver, timeout=None):
+    return wait_for(
+        driver,
+        lambda d: d.execute_script("return document.readyState") == "complete",
+        timeout,
+        "page never finished loading",
+    )
+
+
+def network_idle(driver, idle_time=0.5, timeout=None):
+    """Wait until no new resources have been fetched for idle_time seconds."""
+    state = {"count": -1, "since": time.monotonic()}
+
+    def idle(d):
+        count = d.execute_script("return performance.getEntriesByType('resource').length")
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"] = count
+            state["since"] = now
+            return False
+        return now - state["since"] >= idle_time
+
+    return wait_for(driver, idle, timeout, "network never went idle")
+
+
+class StepTimer:
+    """Records how long each named step of a post takes.
+
+    Use step() as a context manager around each phase and call flush() once
+    the post is done; the timings are appended as one JSON line to
+    metrics_path (nothing is written when metrics_path is None).
+    """
+
+    def __init__(self, metrics_path=None, **context):
+        self.metrics_path = metrics_path
+        self.context = context
+        self.steps = {}
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+        self.error = None
+
+    @contextmanager
+    def step(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.error = f"{name}: {e.__class__.__name__}"
+            raise
+        finally:
+            self.steps[name] = self.steps.get(name, 0.0) + time.perf_counter() - start
+
+    def flush(self):
+        record = dict(self.context)
+        record.update({
+            "started_at": self.started_at,
+            "steps": {name: round(seconds, 4) for name, seconds in self.steps.items()},
+            "total": round(time.perf_counter() - self._start, 4),
+            "error": self.error,
+        })
+        if self.metrics_path:
+            JsonlStore(self.metrics_path).append(record)
+        return record